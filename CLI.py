@@ -1,133 +1,32 @@
+import argparse
 import logging
-import random
-from tkinter import messagebox
+import sys
 
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
+from resources.custom_func import metrics
+from resources.custom_func.probability_sim import SimulationInputError, SimulationParams, simulate_trading
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 
 
-def probability_simulator(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry):
+def probability_simulator(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry, seed=None):
+    logging.info("Starting simulation")
     try:
-        logging.info("Starting simulation")
-        # Get user inputs
-        initial_balance = float(balanceEntry)
-        winrate = float(winrateEntry)
-        risk_percent = float(riskEntry)
-        rr_ratio = float(rrEntry)
-        consecutive_L_treshold = consecutive_LossesEntry
-        num_trades = int(nTrades_entry)
-
-        # Validate inputs
-        if initial_balance <= 0 or risk_percent <= 0 or rr_ratio <= 0 or num_trades <= 0 or winrate <= 0:
-            # result_label.configure(text="Error: All inputs must be positive numbers.")
-            messagebox.showerror(message="Error: All inputs must be positive numbers.")
-            # debuging
-            logging.error("Error: All inputs must be positive numbers.")
-            return
-
-        # Initialize variables
-        balance_history = [initial_balance]
-        balance = initial_balance
-        consecutive_losses = 0
-        max_consecutive_losses = 0
-        wins_profits = 0
-        losses_profits = 0
-        avg_win = 0
-        avg_loss = 0
-        wins = 0
-        losses = 0
-
-        reduced_risk_active = False  # Track if risk reduction is active
-
-        for trade in range(num_trades):
-            if reduced_risk_active:
-                risk_amount = balance * (risk_percent / 100) / 2
-            else:
-                risk_amount = balance * (risk_percent / 100)
-
-            # Simulate trade outcome
-            if random.random() <= winrate:
-                profit = risk_amount * rr_ratio
-                balance += profit
-                wins += 1
-                wins_profits += profit
-                consecutive_losses = 0
-                reduced_risk_active = False  # Reset risk reduction on a win
-                # debuging
-                # logging.info("wining trade")
-            else:
-                loss = risk_amount
-                balance -= loss
-                losses += 1
-                losses_profits += loss
-                consecutive_losses += 1
-                max_consecutive_losses = max(max_consecutive_losses, consecutive_losses)
-                # debuging
-                # logging.info("lossing trade")
-
-            # Check for consecutive losses threshold
-            if consecutive_L_treshold:  # Only reduce risk if the input is not empty
-                try:
-                    threshold = int(consecutive_L_treshold)
-                    if consecutive_losses >= threshold:
-                        reduced_risk_active = True  # Activate risk reduction
-                except ValueError:
-                    pass  # If conversion fails, don't adjust risk
-
-            # Append the current balance to history
-            balance_history.append(balance)
-            if not balance_history:
-                logging.info("Error: Simulation failed. No balance data to plot.")
-                return
-
-        # Calculate Max Drawdown from Balance History
-        max_drawdown = 0
-        peak_balance = balance_history[0]
-
-        for bal in balance_history:
-            if bal > peak_balance:
-                peak_balance = bal
-            drawdown = (peak_balance - bal) / peak_balance
-            max_drawdown = max(max_drawdown, drawdown)
-        max_drawdown *= 100  # Convert to percentage
-
-        # Calculate total return
-        total_return = ((balance - initial_balance) / initial_balance) * 100
-
-        # Expected Value (EV) formula
-        actual_winrate = wins / num_trades if wins > 0 else 0
-        # Calculate average win and loss
-        if wins + losses == num_trades:
-            avg_win = wins_profits / wins if wins > 0 else 0
-            avg_loss = losses_profits / losses if losses > 0 else 0
-
-        expected_value = (actual_winrate * avg_win) - ((1 - actual_winrate) * avg_loss)
-
-        logging.info(
-            f"Final Balance: ${balance:.2f}\n"
-            f"Total Return: {total_return:.2f}%\n"
-            f"Max Drawdown: {max_drawdown:.2f}%\n"
-            f"Consecutive Losses: {max_consecutive_losses:.0f}\n"
-            f"Average Win: ${avg_win:.2f}\n"
-            f"Average Loss: ${avg_loss:.2f}\n"
-            f"Expected Value: ${expected_value:.2f}"
-        )
-        return balance_history
-    except ValueError:
-        messagebox.showerror(message="Error: Please enter valid numbers.")
+        params = SimulationParams.from_inputs(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry)
+    except SimulationInputError as error:
+        # debuging
+        logging.error(str(error))
+        return
+
+    result = simulate_trading(params, seed=seed)
+    with metrics.phase("logging"):
+        logging.info(result.summary())
 
     # debuging
     logging.info("simulation ended.")
+    return result.balance_history
 
 
-def creat_plot(balance_history):
-    plt.style.use("dark_background")
-    fig = Figure(figsize=(9, 6))
-    ax = plt.gca()  # Get the current axis
-    ax.plot(balance_history, label="balance_history")
-
+def style_plot(ax):
     ax.set_title("Simulation Results", color="grey", fontsize=20, loc="center", pad=15)
     ax.grid(color="#161616", linestyle="--", linewidth=0.5, axis="both")
     ax.set_xlabel("Trade Number", color="grey", fontsize=12)
@@ -161,15 +60,37 @@ def creat_plot(balance_history):
         rotation=10,  # Rotate text
         transform=ax.transAxes,  # Transform relative to the axes (0 to 1 range)
     )
+
+
+def creat_plot(balance_history):
+    # pyplot is only needed for plotting, keep it out of headless runs
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from matplotlib.figure import Figure
+
+    from resources.custom_func.fan_chart import ensemble_bands, plot_fan
+
+    with metrics.phase("figure"):
+        plt.style.use("dark_background")
+        fig = Figure(figsize=(9, 6))
+        ax = plt.gca()  # Get the current axis
+        if np.ndim(balance_history) == 2:
+            # a (paths, trades + 1) ensemble: percentile fan and a few sample paths
+            plot_fan(ax, ensemble_bands(balance_history), samples=balance_history[:5])
+        else:
+            ax.plot(balance_history, label="balance_history")
+        style_plot(ax)
+
     logging.info("plotting the graph")
-    plt.savefig("simulation_results.png")
+    with metrics.phase("draw"):
+        plt.savefig("simulation_results.png")
     logging.info("Saving the plot to a file")
     plt.show()
 
     return fig
 
 
-if __name__ == "__main__":
+def run_demo(num_paths=1, exact=False):
     # balanceEntry = input("initial balance: ")
     # winrateEntry = input("winrate: ")
     # riskEntry = input("Risk percentage: ")
@@ -184,5 +105,351 @@ if __name__ == "__main__":
     nTrades_entry = 100
 
     # run the programe
-    balance_history = probability_simulator(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry)
+    if num_paths > 1:
+        from resources.custom_func.vector_sim import simulate_paths
+
+        balance_history, _ = simulate_paths(balanceEntry, winrateEntry, riskEntry, rrEntry, nTrades_entry, num_paths, consecutive_LossesEntry)
+    else:
+        balance_history = probability_simulator(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry)
+    if exact:
+        # what the demo paths are drawn from, without sampling
+        from resources.custom_func.exact_dist import exact_distribution
+
+        params = SimulationParams.from_inputs(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry)
+        with metrics.phase("exact_distribution"):
+            distribution = exact_distribution(params)
+        logging.info(distribution.summary())
     creat_plot(balance_history)
+
+
+def run_batch(args):
+    # headless: numpy only, no plotting imports
+    from resources.custom_func.batch_runner import load_scenarios, open_writer, run_scenarios
+    from resources.custom_func.result_cache import ResultCache
+
+    try:
+        scenarios = load_scenarios(args.scenarios)
+        writer = open_writer(args.out)
+    except (OSError, SimulationInputError) as error:
+        logging.error(str(error))
+        return 1
+    logging.info(f"Running {len(scenarios)} scenarios with the {args.engine} engine")
+    rows = 0
+    try:
+        cache = ResultCache(cache_dir=args.cache_dir) if args.cache_dir else None
+        for row in run_scenarios(scenarios, args.engine, args.paths, args.seed, args.paths_dir, args.crn, args.antithetic, cache):
+            writer.write(row)
+            rows += 1
+    finally:
+        writer.close()
+    logging.info(f"Saved {rows} rows to {args.out}")
+
+
+def run_paths(args):
+    # Simulate straight into a memory-mapped file, then read the summary and plot back
+    # from it slice by slice, so the ensemble can be bigger than RAM
+    from resources.custom_func.path_store import max_drawdowns, percentile_bands, plot_paths, write_paths
+    from resources.custom_func.sizing import parse_sizing
+    from resources.custom_func.sweep import summarize_stats
+
+    try:
+        sizing = parse_sizing(args.sizing) if args.sizing else None
+        store, stats = write_paths(
+            args.out, args.balance, args.winrate, args.risk, args.rr, args.trades, args.paths, args.threshold, args.seed, args.dtype, sizing
+        )
+    except SimulationInputError as error:
+        logging.error(str(error))
+        return 1
+    for name, value in summarize_stats(stats, args.balance).items():
+        logging.info(f"{name}: {value:.4f}")
+
+    if args.plot:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        plt.style.use("dark_background")
+        fig, ax = plt.subplots(figsize=(9, 6))
+        plot_paths(ax, store)
+        style_plot(ax)
+        fig.savefig(args.plot)
+        logging.info(f"Saved the plot to {args.plot}")
+    else:
+        bands = percentile_bands(store, (5, 50, 95))
+        logging.info(f"final balance p5/p50/p95: {bands[0, -1]:.2f} / {bands[1, -1]:.2f} / {bands[2, -1]:.2f}")
+        logging.info(f"worst max drawdown: {max_drawdowns(store).max():.2f}%")
+
+
+def run_exact(args):
+    from resources.custom_func.exact_dist import check_against_monte_carlo, exact_distribution
+
+    try:
+        params = SimulationParams.from_inputs(args.balance, args.winrate, args.risk, args.rr, args.threshold, args.trades)
+        distribution = exact_distribution(params)
+    except SimulationInputError as error:
+        logging.error(str(error))
+        return 1
+    logging.info(distribution.summary())
+    if args.check:
+        for name, (exact, sampled) in check_against_monte_carlo(params, args.check, args.seed).items():
+            logging.info(f"{name}: exact {exact:.4f}, Monte Carlo {sampled:.4f}")
+
+
+def run_ruin(args):
+    from resources.custom_func.risk_of_ruin import drawdown_first_passage, streak_probabilities
+
+    try:
+        params = SimulationParams.from_inputs(args.balance, args.winrate, args.risk, args.rr, args.threshold, args.trades)
+        passage = drawdown_first_passage(params, args.drawdown)
+        streaks = streak_probabilities(params.winrate, params.num_trades, args.streaks)
+    except SimulationInputError as error:
+        logging.error(str(error))
+        return 1
+    logging.info(passage.summary())
+    for streak, probability in zip(args.streaks, streaks):
+        logging.info(f"P({streak}-loss streak within {params.num_trades} trades): {probability * 100:.2f}%")
+
+
+def run_adaptive(args):
+    from resources.custom_func.adaptive_sim import Target, adaptive_simulate
+    from resources.custom_func.sizing import parse_sizing
+
+    try:
+        targets = [Target.parse(text) for text in args.target]
+        sizing = parse_sizing(args.sizing) if args.sizing else None
+        result = adaptive_simulate(
+            args.balance,
+            args.winrate,
+            args.risk,
+            args.rr,
+            args.trades,
+            targets,
+            args.threshold,
+            args.seed,
+            batch_paths=args.batch,
+            max_paths=args.max_paths,
+            confidence=args.confidence,
+            sizing=sizing,
+        )
+    except ValueError as error:
+        logging.error(str(error))
+        return 1
+    logging.info(result.summary())
+
+
+def run_solve(args):
+    # batched root-finding: one line per (rr, threshold) pair
+    from resources.custom_func.min_winrate import max_risk_calculator, min_winrate_calculator
+
+    options = dict(num_trades=args.trades, initial_balance=args.balance, method=args.method, num_paths=args.paths, seed=args.seed)
+    try:
+        rr_ratios = [float(value) for value in args.rr.split(",")]
+    except ValueError:
+        logging.error("Error: Please enter valid numbers.")
+        return 1
+    try:
+        if args.solve == "winrate":
+            solutions = min_winrate_calculator(args.goal, rr_ratios, args.threshold, risk_percent=args.risk, **options)
+        else:
+            solutions = max_risk_calculator(args.goal, rr_ratios, args.threshold, winrate=args.winrate, **options)
+    except ValueError as error:
+        logging.error(str(error))
+        return 1
+    name = "min winrate" if args.solve == "winrate" else "max risk %"
+    for solution in solutions:
+        reducer = solution.threshold if solution.threshold is not None else "off"
+        if solution.solved:
+            logging.info(f"rr {solution.rr_ratio:g}, reducer {reducer}: {name} {solution.value:.4f} (P = {solution.probability:.4f})")
+        else:
+            logging.info(f"rr {solution.rr_ratio:g}, reducer {reducer}: goal not reachable (P = {solution.probability:.4f} at the bound)")
+
+
+def run_bootstrap(args):
+    # the summary of paths resampled from a trade journal instead of a fixed winrate
+    from resources.custom_func.bootstrap import bootstrap_paths, load_r_multiples
+    from resources.custom_func.sizing import parse_sizing
+    from resources.custom_func.sweep import summarize_stats
+
+    try:
+        r_multiples = load_r_multiples(args.journal, args.column)
+        sizing = parse_sizing(args.sizing) if args.sizing else None
+        with metrics.phase("bootstrap"):
+            _, stats = bootstrap_paths(
+                r_multiples,
+                args.balance,
+                args.risk,
+                args.trades,
+                args.paths,
+                args.threshold,
+                args.seed,
+                args.method,
+                args.block,
+                keep_paths=False,
+                sizing=sizing,
+            )
+    except (OSError, ValueError) as error:
+        logging.error(str(error))
+        return 1
+    metrics.count("paths", args.paths)
+    logging.info(f"{len(r_multiples)} journal trades, winrate {(r_multiples > 0).mean():.4f}, mean R {r_multiples.mean():.4f}")
+    for name, value in summarize_stats(stats, args.balance).items():
+        logging.info(f"{name}: {value:.4f}")
+
+
+def threshold_arg(text):
+    # --threshold of every command: empty or 0 leaves the reducer off, as in sweep and batch
+    try:
+        threshold = int(text) if text.strip() else 0
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid threshold {text!r}") from None
+    if threshold < 0:
+        raise argparse.ArgumentTypeError(f"invalid threshold {text!r}")
+    return threshold or None
+
+
+def threshold_list(text):
+    return [threshold_arg(value) for value in text.split(",")]
+
+
+THRESHOLD_HELP = "consecutive losses before halving risk, 0 = off"
+SIZING_HELP = "position sizing instead of the threshold: fixed, dollar:AMOUNT, kelly[:FRACTION[:CAP]], anti:STEP:MAX, streak:N=SCALE,..."
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "sweep":
+        from resources.custom_func.sweep import main as sweep_main
+
+        return sweep_main(argv[1:])
+    if argv and argv[0] == "bench":
+        from resources.custom_func.benchmark import main as bench_main
+
+        return bench_main(argv[1:])
+
+    parser = argparse.ArgumentParser(description="Probability simulator. Without a command, runs and plots the demo scenario.")
+    parser.add_argument("--paths", type=int, default=1, help="demo only: simulate this many paths and plot them as a fan chart")
+    parser.add_argument("--exact", action="store_true", help="demo only: also log the exact final-balance distribution")
+    parser.add_argument("--metrics", default=None, help="time the run's phases and save the metrics to this .json file")
+    parser.add_argument("--profile", action="store_true", help="with --metrics: add the top functions of a cProfile run")
+    parser.add_argument("--trace-memory", action="store_true", help="with --metrics: add the tracemalloc peak memory")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("sweep", help="parallel parameter sweep, see 'sweep --help'")
+    subparsers.add_parser("bench", help="benchmark the simulation engines, see 'bench --help'")
+    batch = subparsers.add_parser("batch", help="run every scenario of a .csv/.json/.yaml file")
+    batch.add_argument("scenarios", help="scenario file, one scenario per row/entry")
+    batch.add_argument("--out", default="batch_results.csv", help="summary rows: .csv, .parquet or .npz")
+    batch.add_argument("--engine", choices=("vector", "scalar", "streaming"), default="vector")
+    batch.add_argument("--paths", type=int, default=1000, help="paths per scenario unless the scenario sets num_paths")
+    batch.add_argument("--seed", type=int, default=None)
+    batch.add_argument("--paths-dir", default=None, help="also save each scenario's balance paths here as compressed .npz")
+    batch.add_argument("--crn", action="store_true", help="common random numbers: every scenario runs on the same draws")
+    batch.add_argument("--antithetic", action="store_true", help="run the paths in antithetic pairs")
+    batch.add_argument("--cache-dir", default=None, help="reuse the results of earlier seeded runs stored here")
+    paths = subparsers.add_parser("paths", help="simulate a large ensemble into a memory-mapped .npy file")
+    paths.add_argument("out", help=".npy file for the (trades + 1, paths) balance matrix")
+    paths.add_argument("--balance", type=float, default=50000)
+    paths.add_argument("--winrate", type=float, default=0.5)
+    paths.add_argument("--risk", type=float, default=1, help="risk percent per trade")
+    paths.add_argument("--rr", type=float, default=2)
+    paths.add_argument("--threshold", type=threshold_arg, default=None, help=THRESHOLD_HELP)
+    paths.add_argument("--trades", type=int, default=1000)
+    paths.add_argument("--paths", type=int, default=100000)
+    paths.add_argument("--seed", type=int, default=None)
+    paths.add_argument("--dtype", choices=("float64", "float32"), default="float64", help="float32 halves the file")
+    paths.add_argument("--plot", default=None, help="save sample paths and percentile bands to this image")
+    paths.add_argument("--sizing", default=None, help=SIZING_HELP)
+    exact = subparsers.add_parser("exact", help="exact distribution of the final balance, no sampling")
+    exact.add_argument("--balance", type=float, default=50000)
+    exact.add_argument("--winrate", type=float, default=0.5)
+    exact.add_argument("--risk", type=float, default=1, help="risk percent per trade")
+    exact.add_argument("--rr", type=float, default=2)
+    exact.add_argument("--threshold", type=threshold_arg, default=None, help=THRESHOLD_HELP)
+    exact.add_argument("--trades", type=int, default=100)
+    exact.add_argument("--check", type=int, default=0, metavar="PATHS", help="compare with a Monte Carlo run of PATHS paths")
+    exact.add_argument("--seed", type=int, default=None)
+    ruin = subparsers.add_parser("ruin", help="exact drawdown and losing-streak probabilities, no sampling")
+    ruin.add_argument("--balance", type=float, default=50000)
+    ruin.add_argument("--winrate", type=float, default=0.5)
+    ruin.add_argument("--risk", type=float, default=1, help="risk percent per trade")
+    ruin.add_argument("--rr", type=float, default=2)
+    ruin.add_argument("--threshold", type=threshold_arg, default=None, help=THRESHOLD_HELP)
+    ruin.add_argument("--trades", type=int, default=500)
+    ruin.add_argument("--drawdown", type=float, default=20, help="drawdown from the peak, in percent")
+    ruin.add_argument("--streaks", type=int, nargs="+", default=[5, 10], help="losing streak lengths")
+    adaptive = subparsers.add_parser("adaptive", help="sample paths in batches until the targets are precise enough")
+    adaptive.add_argument("--balance", type=float, default=50000)
+    adaptive.add_argument("--winrate", type=float, default=0.5)
+    adaptive.add_argument("--risk", type=float, default=1, help="risk percent per trade")
+    adaptive.add_argument("--rr", type=float, default=2)
+    adaptive.add_argument("--threshold", type=threshold_arg, default=None, help=THRESHOLD_HELP)
+    adaptive.add_argument("--trades", type=int, default=100)
+    adaptive.add_argument(
+        "--target", action="append", default=None, help="mean:STAT:TOL or pQ:STAT:TOL, e.g. p95:max_drawdown:0.1 (repeatable)"
+    )
+    adaptive.add_argument("--batch", type=int, default=2000, help="paths in the first batch")
+    adaptive.add_argument("--max-paths", type=int, default=1000000, help="path budget")
+    adaptive.add_argument("--confidence", type=float, default=0.95)
+    adaptive.add_argument("--seed", type=int, default=None)
+    adaptive.add_argument("--sizing", default=None, help=SIZING_HELP)
+    solve = subparsers.add_parser("solve", help="minimum winrate or maximum risk that meets a goal, for many rr/threshold pairs")
+    solve.add_argument("--goal", required=True, help="e.g. 'P(total_return>0)>=0.95' or 'P(max_drawdown>25)<=0.05'")
+    solve.add_argument("--solve", choices=("winrate", "risk"), default="winrate")
+    solve.add_argument("--balance", type=float, default=50000)
+    solve.add_argument("--winrate", type=float, default=0.5, help="when solving for risk")
+    solve.add_argument("--risk", type=float, default=1, help="risk percent per trade, when solving for winrate")
+    solve.add_argument("--rr", default="2", help="comma separated rr ratios")
+    solve.add_argument("--threshold", type=threshold_list, default=[None], help="comma separated, " + THRESHOLD_HELP)
+    solve.add_argument("--trades", type=int, default=100)
+    solve.add_argument("--method", choices=("exact", "monte_carlo"), default="exact")
+    solve.add_argument("--paths", type=int, default=20000, help="Monte Carlo paths per evaluation")
+    solve.add_argument("--seed", type=int, default=None)
+    bootstrap = subparsers.add_parser("bootstrap", help="resample the R-multiples of a trade journal .csv into many paths")
+    bootstrap.add_argument("journal", help=".csv with one trade per row")
+    bootstrap.add_argument("--column", default=None, help="R-multiple column name or index, default r_multiple, r or R")
+    bootstrap.add_argument("--balance", type=float, default=50000)
+    bootstrap.add_argument("--risk", type=float, default=1, help="risk percent per trade")
+    bootstrap.add_argument("--threshold", type=threshold_arg, default=None, help=THRESHOLD_HELP)
+    bootstrap.add_argument("--trades", type=int, default=1000)
+    bootstrap.add_argument("--paths", type=int, default=100000)
+    bootstrap.add_argument("--method", choices=("iid", "block", "stationary"), default="stationary")
+    bootstrap.add_argument("--block", type=int, default=10, help="block length, the mean one for stationary")
+    bootstrap.add_argument("--seed", type=int, default=None)
+    bootstrap.add_argument("--sizing", default=None, help=SIZING_HELP)
+    args = parser.parse_args(argv)
+
+    # the status of the command: 1 when it failed, like sweep and bench
+    if args.metrics is None:
+        return run_command(args)
+    run_metrics = metrics.enable(metrics.Metrics(args.profile, args.trace_memory, args.metrics))
+    try:
+        with run_metrics.capture():
+            return run_command(args)
+    finally:
+        metrics.disable()
+        logging.info(run_metrics.summary())
+        run_metrics.dump()
+
+
+def run_command(args):
+    if args.command == "batch":
+        return run_batch(args)
+    elif args.command == "paths":
+        return run_paths(args)
+    elif args.command == "exact":
+        return run_exact(args)
+    elif args.command == "ruin":
+        return run_ruin(args)
+    elif args.command == "solve":
+        return run_solve(args)
+    elif args.command == "bootstrap":
+        return run_bootstrap(args)
+    elif args.command == "adaptive":
+        args.target = args.target or ["mean:total_return:0.1"]
+        return run_adaptive(args)
+    else:
+        run_demo(args.paths, args.exact)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,116 +2,66 @@ import logging
 import tkinter as tk
 from tkinter import messagebox, ttk
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-
 # custom module
+from resources.custom_func import metrics
+from resources.custom_func.background import BackgroundRunner
 from resources.custom_func.expirements_funcs import (get_balance_history,
-                                                     probability_simulator)
+                                                     get_max_dd, read_params,
+                                                     store_result)
+from resources.custom_func.plot_view import PlotView
+from resources.custom_func.probability_sim import simulate_trading
+
+# configured once here, the simulation helpers only log
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 
 
 # ------------ plotting -------------#
-def start_simulation():
-    probability_simulator(
-        balanceEntry,
-        winrateEntry,
-        riskEntry,
-        rrEntry,
-        consecutive_LossesEntry,
-        nTrades_entry,
-        result_label,
+def plot_to_canvas():
+    # the simulation runs on the worker thread, draw_plot gets the result on the main loop
+    if runner.busy:
+        return
+    params = read_params(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry)
+    if params is None:
+        return
+    logging.info("Starting simulation")
+    runner.start(
+        metrics.captured(lambda job: simulate_trading(params, progress=job.report)),
+        draw_plot,
+        on_progress=lambda fraction: progress_bar.configure(value=fraction * 100),
+        on_cancel=simulation_stopped,
+        on_error=lambda error: simulation_stopped(f"Error: {error}"),
     )
+    calculateButton.config(state="disabled")
+    cancelButton.config(state="normal")
 
 
-def creat_plot():
-    plt.style.use("dark_background")
-    fig = Figure(figsize=(9, 6))
-    ax = fig.add_subplot()
-    data = get_balance_history()
-    ax.plot(data, label="balance_history")
-
-    ax.set_title("Simulation Results", color="grey", fontsize=20, loc="center", pad=15)
-    ax.grid(color="#161616", linestyle="--", linewidth=0.5, axis="both")
-
-    # ax.set_xlabel("Trade Number", color='grey', fontsize=12)
-    # ax.set_ylabel("Balance", color='grey', fontsize=12)
-
-    # Remove right and top spines
-    ax.spines["right"].set_visible(False)
-    ax.spines["top"].set_visible(False)
+def simulation_stopped(message=None):
+    calculateButton.config(state="normal")
+    cancelButton.config(state="disabled")
+    progress_bar.configure(value=0)
+    if message is not None:
+        result_label.configure(text=message)
 
-    # Change x and y ticks style
-    ax.tick_params(axis="x", direction="inout", length=6, width=2)
-    ax.tick_params(axis="y", direction="inout", length=6, width=2)
-
-    # Change x and y label line width and color
-    ax.spines["bottom"].set_linewidth(2)
-    ax.spines["left"].set_linewidth(2)
-    ax.spines["bottom"].set_color("grey")
-    ax.spines["left"].set_color("grey")
-
-    # Change x and y ticks color
-    ax.tick_params(axis="x", colors="grey")
-    ax.tick_params(axis="y", colors="grey")
 
+def draw_plot(result):
+    simulation_stopped()
+    store_result(result, result_label)
     # Adding annotations for max drawdown
-    # max_dd = get_max_dd()
-    # balance_history = get_balance_history()
-    # ax.scatter(
-    #     max_dd,
-    #     balance_history[(max_dd)],
-    #     color="red",
-    #     label="Max Drawdown Point",
-    #     zorder=10,
-    # )
-    # Add a watermark
-    ax.text(
-        0.5,
-        0.5,  # X and Y position (relative, in axes coordinates)
-        "@MR_5OBOT",  # Watermark text
-        fontsize=30,  # Font size
-        color="gray",  # Text color
-        alpha=0.12,  # Transparency (0.0 to 1.0)
-        ha="center",  # Horizontal alignment
-        va="center",  # Vertical alignment
-        rotation=10,  # Rotate text
-        transform=ax.transAxes,  # Transform relative to the axes (0 to 1 range)
-    )
-    logging.info("plotting the graph")
-
-    return fig
-
-
-def plot_to_canvas():
-    # Add canvas to the plotFrame
-    clear_plot()
-    start_simulation()
-    fig = creat_plot()
-    canvas = FigureCanvasTkAgg(fig, master=plotFrame)  # A tk.DrawingArea.
-    canvas.get_tk_widget().pack(fill="both", expand=True)
-    canvas.draw()
-    logging.info("Plotting the graph to the canvas")
+    max_dd = get_max_dd()
+    balance_history = get_balance_history()
+    plot_view.update(balance_history, mark=(max_dd, balance_history[(max_dd)]))
+    metrics.dump()
 
 
 def save_plot():
-    try:
-        fig = creat_plot()
-        fig.savefig("simulation_results.png")
-        logging.info("Saving the plot to a file")
-        messagebox.showinfo(
-            "Save", "The plot has been saved as 'simulation_results.png'"
-        )
-    except Exception:
+    if not plot_view.has_data:
         messagebox.showerror(
             "Error", "No data to save. Please run the simulation first."
         )
-
-
-def clear_plot():
-    # Clear the previous plot
-    for widget in plotFrame.winfo_children():
-        widget.destroy()
+        return
+    plot_view.save("simulation_results.png")
+    logging.info("Saving the plot to a file")
+    messagebox.showinfo("Save", "The plot has been saved as 'simulation_results.png'")
 
 
 # the function that will be triggered when the checkbox is toggled
@@ -124,6 +74,9 @@ def risk_reducer_func():
 
 
 # ------- GUI ------#
+# SIM_METRICS=metrics.json turns on the phase timers, dumped after every run
+metrics.enable_from_env()
+
 app = tk.Tk()
 style = ttk.Style(app)  # Create a style object
 app.tk.call(
@@ -200,9 +153,24 @@ result_label.pack(expand=True, fill="both", padx=5, pady=5)
 save_pic = ttk.Button(inputsLabel, text="Save Results", command=save_plot)
 save_pic.grid(column=0, row=11, pady=5, padx=5)
 
+progress_bar = ttk.Progressbar(
+    inputsLabel, orient="horizontal", mode="determinate", maximum=100
+)
+progress_bar.grid(column=0, row=12, sticky="ew", pady=5)
+
+cancelButton = ttk.Button(
+    inputsLabel, text="Cancel", command=lambda: runner.cancel(), state="disabled"
+)
+cancelButton.grid(column=0, row=13, sticky="ew", pady=5)
+
 # ----- tab1 plot frame -----#
 plotFrame = ttk.LabelFrame(app_frame, text="Plot Graph", padding=(15, 15))
 plotFrame.pack(expand=True, fill="both", side="right", pady=10, padx=10)
+# built once, every run only updates its data
+plot_view = PlotView(plotFrame)
+
+# simulations run off the main loop, one at a time
+runner = BackgroundRunner(app)
 
 # Configure grid weights for responsiveness
 app_frame.grid_rowconfigure(0, weight=1)
@@ -211,6 +179,7 @@ app_frame.grid_columnconfigure(1, weight=1)
 
 # Ensure that we exit the mainloop when the window is closed
 def on_closing():
+    runner.shutdown()
     app.quit()
 
 
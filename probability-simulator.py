@@ -2,93 +2,95 @@ import logging
 import tkinter as tk
 from tkinter import messagebox, ttk
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 # custom module
-from resources.custom_func.sim_func import (get_balance_history,
-                                            probability_simulator)
+from resources.custom_func import metrics
+from resources.custom_func.background import BackgroundRunner
+from resources.custom_func.drawdown import max_drawdown_point
+from resources.custom_func.plot_view import PlotView
+from resources.custom_func.probability_sim import simulate_trading
+from resources.custom_func.sim_func import (read_num_paths, read_params,
+                                            show_ensemble, show_result,
+                                            simulate_ensemble)
+
+
+# configured once here, the simulation helpers only log
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+# paths the percentile bands of a live frame are computed from
+LIVE_PATHS = 1000
 
 
 # ------------ plotting -------------#
-def start_simulation():
-    probability_simulator(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry, result_label)
-
-
-def creat_plot():
-    plt.style.use("dark_background")
-    fig = Figure(figsize=(9, 6))
-    ax = fig.add_subplot()
-    # data = get_balance_history()
-    balance_history = probability_simulator(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry, result_label)
-    ax.plot(balance_history, label="balance_history")
-
-    ax.set_title("Simulation Results", color="grey", fontsize=20, loc="center", pad=15)
-    ax.grid(color="#161616", linestyle="--", linewidth=0.5, axis="both")
-
-    # ax.set_xlabel("Trade Number", color='grey', fontsize=12)
-    # ax.set_ylabel("Balance", color='grey', fontsize=12)
-
-    # Remove right and top spines
-    ax.spines["right"].set_visible(False)
-    ax.spines["top"].set_visible(False)
-
-    # Change x and y ticks style
-    ax.tick_params(axis="x", direction="inout", length=6, width=2)
-    ax.tick_params(axis="y", direction="inout", length=6, width=2)
-
-    # Change x and y label line width and color
-    ax.spines["bottom"].set_linewidth(2)
-    ax.spines["left"].set_linewidth(2)
-    ax.spines["bottom"].set_color("grey")
-    ax.spines["left"].set_color("grey")
-
-    # Change x and y ticks color
-    ax.tick_params(axis="x", colors="grey")
-    ax.tick_params(axis="y", colors="grey")
-
-    # Add a watermark
-    ax.text(
-        0.5,
-        0.5,  # X and Y position (relative, in axes coordinates)
-        "@MR_5OBOT",  # Watermark text
-        fontsize=30,  # Font size
-        color="gray",  # Text color
-        alpha=0.12,  # Transparency (0.0 to 1.0)
-        ha="center",  # Horizontal alignment
-        va="center",  # Vertical alignment
-        rotation=10,  # Rotate text
-        transform=ax.transAxes,  # Transform relative to the axes (0 to 1 range)
+def plot_to_canvas():
+    # Run the simulation on the worker thread; the plot is drawn by simulation_done once
+    # the result is back on the main loop, so the window stays responsive meanwhile
+    if runner.busy:
+        return
+    params = read_params(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry, result_label)
+    if params is None:
+        return
+    num_paths = read_num_paths(pathsEntry)
+    logging.info("Starting simulation")
+    if num_paths > 1:
+        # an ensemble from the vector engine, drawn as a fan chart
+        work = lambda job: simulate_ensemble(params, num_paths, progress=job.report, publish=job.publish)
+        done = lambda result: ensemble_done(result, params.initial_balance)
+    else:
+        work = lambda job: simulate_trading(params, progress=job.report)
+        done = simulation_done
+    runner.start(
+        metrics.captured(work),
+        done,
+        on_partial=draw_partial_ensemble,
+        on_progress=lambda fraction: progress_bar.configure(value=fraction * 100),
+        on_cancel=simulation_stopped,
+        on_error=lambda error: simulation_stopped(f"Error: {error}"),
     )
-    logging.info("plotting the graph")
+    calculateButton.config(state="disabled")
+    cancelButton.config(state="normal")
 
-    return fig
 
+def simulation_done(result):
+    simulation_stopped()
+    progress_bar.configure(value=100)
+    balance_history = show_result(result, result_label)
+    # mark the deepest point of the max drawdown
+    plot_view.update(balance_history, max_drawdown_point(balance_history))
+    metrics.dump()
 
-def plot_to_canvas():
-    # Add canvas to the plotFrame
-    clear_plot()
-    fig = creat_plot()
-    canvas = FigureCanvasTkAgg(fig, master=plotFrame)  # A tk.DrawingArea.
-    canvas.get_tk_widget().pack(fill="both", expand=True)
-    canvas.draw()
-    logging.info("Plotting the graph to the canvas")
 
+def draw_partial_ensemble(partial):
+    # live frame while the ensemble is still running: the bands of the paths done so
+    # far, from an evenly strided subset so a frame costs the same however many are done
+    done, balances = partial
+    step = -(-done // LIVE_PATHS)
+    plot_view.update_fan(balances[:done:step])
 
-def save_plot():
-    try:
-        fig = creat_plot()
-        fig.savefig("simulation_results.png")
-        logging.info("Saving the plot to a file")
-        messagebox.showinfo("Save", "The plot has been saved as 'simulation_results.png'")
-    except Exception:
-        messagebox.showerror("Error", "No data to save. Please run the simulation first.")
 
+def ensemble_done(result, initial_balance):
+    balances, stats = result
+    simulation_stopped()
+    progress_bar.configure(value=100)
+    show_ensemble(stats, initial_balance, result_label)
+    plot_view.update_fan(balances)
+    metrics.dump()
 
-def clear_plot():
-    # Clear the previous plot
-    for widget in plotFrame.winfo_children():
-        widget.destroy()
+
+def simulation_stopped(message=None):
+    calculateButton.config(state="normal")
+    cancelButton.config(state="disabled")
+    progress_bar.configure(value=0)
+    if message is not None:
+        result_label.configure(text=message)
+
+
+def save_plot():
+    if not plot_view.has_data:
+        messagebox.showerror("Error", "No data to save. Please run the simulation first.")
+        return
+    plot_view.save("simulation_results.png")
+    logging.info("Saving the plot to a file")
+    messagebox.showinfo("Save", "The plot has been saved as 'simulation_results.png'")
 
 
 # the function that will be triggered when the checkbox is toggled
@@ -101,6 +103,9 @@ def risk_reducer_func():
 
 
 # ------- GUI ------#
+# SIM_METRICS=metrics.json turns on the phase timers, dumped after every run
+metrics.enable_from_env()
+
 app = tk.Tk()
 style = ttk.Style(app)  # Create a style object
 app.tk.call("source", "./resources/Forest-ttk-theme/forest-dark.tcl")  # Load custom theme
@@ -147,6 +152,11 @@ consecutive_LossesEntry.bind("<FocusIn>", lambda _: consecutive_LossesEntry.dele
 consecutive_LossesEntry.grid(column=0, row=5, sticky="ew", pady=5)
 consecutive_LossesEntry.config(state="disabled")
 
+pathsEntry = ttk.Spinbox(inputsLabel, from_=1, to=100000, increment=100)
+pathsEntry.insert(0, "paths (1)")
+pathsEntry.bind("<FocusIn>", lambda _: pathsEntry.delete("0", "end"))
+pathsEntry.grid(column=0, row=6, sticky="ew", pady=5)
+
 # Variable for Checkbutton state
 check_var = tk.IntVar()
 # Create Checkbutton and place it inside the LabelFrame
@@ -167,9 +177,20 @@ result_label.pack(expand=True, fill="both", padx=5, pady=5)
 save_pic = ttk.Button(inputsLabel, text="Save Results", command=save_plot)
 save_pic.grid(column=0, row=11, pady=5, padx=5)
 
+progress_bar = ttk.Progressbar(inputsLabel, orient="horizontal", mode="determinate", maximum=100)
+progress_bar.grid(column=0, row=12, sticky="ew", pady=5)
+
+cancelButton = ttk.Button(inputsLabel, text="Cancel", command=lambda: runner.cancel(), state="disabled")
+cancelButton.grid(column=0, row=13, sticky="ew", pady=5)
+
 # ----- tab1 plot frame -----#
 plotFrame = ttk.LabelFrame(app_frame, text="Plot Graph", padding=(15, 15))
 plotFrame.pack(expand=True, fill="both", side="right", pady=10, padx=10)
+# built once, every run only updates its data
+plot_view = PlotView(plotFrame)
+
+# simulations run off the main loop, one at a time
+runner = BackgroundRunner(app)
 
 # Configure grid weights for responsiveness
 app_frame.grid_rowconfigure(0, weight=1)
@@ -178,6 +199,7 @@ app_frame.grid_columnconfigure(1, weight=1)
 
 # Ensure that we exit the mainloop when the window is closed
 def on_closing():
+    runner.shutdown()
     app.quit()
 
 
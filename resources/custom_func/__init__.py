@@ -1,4 +1,4 @@
-# from .min_winrate import min_winrate_calculator
+from .min_winrate import min_winrate_calculator
 # from .position_size_forex import get_position_sizing_result_forex
 # from .position_size_futures import get_position_sizing_result_futures
-# from .probability_sim import simulate_trading
+from .probability_sim import SimulationInputError, SimulationParams, SimulationResult, simulate_trading
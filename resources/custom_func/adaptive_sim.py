@@ -0,0 +1,198 @@
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+
+from .probability_sim import SimulationInputError
+from .rng_streams import as_streams
+from .vector_sim import STAT_NAMES, simulate_paths
+
+_TARGET = re.compile(r"^(mean|p\d+(?:\.\d+)?):(\w+):(\d+(?:\.\d*)?(?:e-?\d+)?)$")
+
+
+@dataclass(frozen=True)
+class Target:
+    # A statistic to pin down: the mean of `stat` across paths, or its percentile when
+    # percentile is set, to within +-tolerance (in the stat's own units, e.g. percent
+    # points for total_return and max_drawdown)
+    stat: str
+    tolerance: float
+    percentile: Optional[float] = None
+
+    def __post_init__(self):
+        if self.stat not in STAT_NAMES:
+            raise ValueError(f"Unknown stat {self.stat!r}, choose from {', '.join(STAT_NAMES)}")
+        if self.tolerance <= 0:
+            raise ValueError("The tolerance must be positive")
+        if self.percentile is not None and not 0 <= self.percentile <= 100:
+            raise ValueError("The percentile must be between 0 and 100")
+
+    @property
+    def label(self):
+        return f"mean_{self.stat}" if self.percentile is None else f"p{self.percentile:g}_{self.stat}"
+
+    @classmethod
+    def parse(cls, text):
+        # "mean:total_return:0.1" or "p95:max_drawdown:0.5"
+        match = _TARGET.match(text.replace(" ", ""))
+        if match is None:
+            raise ValueError(f"Invalid target {text!r}, expected e.g. 'mean:total_return:0.1' or 'p95:max_drawdown:0.5'")
+        kind, stat, tolerance = match.groups()
+        return cls(stat, float(tolerance), None if kind == "mean" else float(kind.lstrip("p")))
+
+
+class _Running:
+    # Mean and variance of a stat merged batch by batch (Chan et al.), plus the values
+    # themselves for the percentile targets (one float per path, never the paths)
+    def __init__(self, keep_values):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.values = [] if keep_values else None
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        count = len(values)
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        if self.values is not None:
+            self.values.append(values)
+
+    def sorted_values(self):
+        if len(self.values) > 1:
+            self.values = [np.concatenate(self.values)]
+        return np.sort(self.values[0])
+
+
+@dataclass
+class Estimate:
+    value: float
+    low: float
+    high: float
+
+    @property
+    def half_width(self):
+        return (self.high - self.low) / 2
+
+
+@dataclass
+class AdaptiveResult:
+    # estimates: {target label: Estimate}, num_paths: paths simulated, converged: every
+    # target reached its tolerance before the path budget ran out
+    estimates: dict
+    num_paths: int
+    converged: bool
+    targets: list = field(repr=False)
+
+    def summary(self):
+        status = "converged" if self.converged else "path budget reached"
+        lines = [f"Paths: {self.num_paths} ({status})"]
+        for target in self.targets:
+            estimate = self.estimates[target.label]
+            lines.append(f"{target.label}: {estimate.value:.4f} ({estimate.low:.4f} - {estimate.high:.4f})")
+        return "\n".join(lines)
+
+
+def _estimate(target, running, z):
+    if target.percentile is None:
+        half_width = z * math.sqrt(running.m2 / max(running.count - 1, 1) / running.count)
+        return Estimate(running.mean, running.mean - half_width, running.mean + half_width)
+    # distribution-free interval from the order statistics: the rank of the q-th
+    # percentile is binomial(n, q), so its bounds are the ranks z standard deviations away
+    values = running.sorted_values()
+    n = len(values)
+    q = target.percentile / 100
+    spread = z * math.sqrt(n * q * (1 - q))
+    value = float(np.percentile(values, target.percentile))
+    low = values[max(0, math.floor(n * q - spread))]
+    high = values[min(n - 1, math.ceil(n * q + spread))]
+    return Estimate(value, float(low), float(high))
+
+
+def iter_adaptive(
+    initial_balance,
+    winrate,
+    risk_percent,
+    rr_ratio,
+    num_trades,
+    targets,
+    consecutive_L_treshold=None,
+    seed=None,
+    batch_paths=2000,
+    max_paths=1000000,
+    confidence=0.95,
+    sizing=None,
+):
+    """Simulate batches of paths until every target is within its tolerance.
+
+    Yields (num_paths, estimates, stats) after each batch: estimates maps every
+    target label to an Estimate with its confidence interval, stats holds the
+    per-path stats of that batch. The next batch is sized from how far the
+    widest interval still is from its tolerance, so easy configurations stop
+    after one batch and noisy ones get the paths. The batches are consecutive
+    paths of seed, so n paths give exactly the numbers of simulate_paths with
+    num_paths=n. Stops after max_paths paths at the latest. sizing is an
+    optional PositionSizing strategy.
+    """
+    targets = list(targets)
+    if not targets:
+        raise ValueError("Give at least one target")
+    batch_paths = int(batch_paths)
+    max_paths = int(max_paths)
+    if batch_paths <= 0 or max_paths <= 0:
+        raise SimulationInputError("Error: All inputs must be positive numbers.")
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    streams = as_streams(seed)
+    percentile_stats = {target.stat for target in targets if target.percentile is not None}
+    running = {stat: _Running(stat in percentile_stats) for stat in {target.stat for target in targets}}
+
+    num_paths = 0
+    next_batch = min(batch_paths, max_paths)
+    while next_batch > 0:
+        _, stats = simulate_paths(
+            initial_balance,
+            winrate,
+            risk_percent,
+            rr_ratio,
+            num_trades,
+            next_batch,
+            consecutive_L_treshold,
+            streams,
+            keep_paths=False,
+            path_start=num_paths,
+            sizing=sizing,
+        )
+        num_paths += next_batch
+        for stat, values in running.items():
+            values.add(stats[stat])
+        estimates = {target.label: _estimate(target, running[target.stat], z) for target in targets}
+        yield num_paths, estimates, stats
+
+        # the interval shrinks like 1/sqrt(n): paths still needed by the worst target,
+        # at most 4x what we have so a poor early guess doesn't overshoot
+        ratio = max(estimates[target.label].half_width / target.tolerance for target in targets)
+        if ratio <= 1:
+            return
+        wanted = math.ceil(num_paths * (ratio**2 - 1) * 1.1)
+        next_batch = min(max(wanted, batch_paths), 4 * num_paths, max_paths - num_paths)
+
+
+def adaptive_simulate(initial_balance, winrate, risk_percent, rr_ratio, num_trades, targets, consecutive_L_treshold=None, seed=None, **options):
+    # Runs iter_adaptive to the end, returns an AdaptiveResult. options: batch_paths,
+    # max_paths, confidence, sizing
+    targets = list(targets)
+    for num_paths, estimates, _ in iter_adaptive(
+        initial_balance, winrate, risk_percent, rr_ratio, num_trades, targets, consecutive_L_treshold, seed, **options
+    ):
+        logging.debug(f"Adaptive run: {num_paths} paths, {estimates}")
+    converged = all(estimates[target.label].half_width <= target.tolerance for target in targets)
+    return AdaptiveResult(estimates, num_paths, converged, targets)
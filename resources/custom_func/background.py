@@ -0,0 +1,120 @@
+# Runs simulations off the Tk main loop. Tk widgets may only be touched from the main
+# thread, so the worker never sees them: the GUI reads its inputs first, the work runs
+# on a worker thread, and the result is handed back through after() polling
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# shortest time between two live updates of partial results
+FRAME_MS = 250
+
+
+class SimulationCancelled(Exception):
+    pass
+
+
+class BackgroundJob:
+    # Shared between the worker and the main loop: the worker reports progress through
+    # report() (pass it as the engine's progress callback), which raises
+    # SimulationCancelled once cancel() was called, and may publish() partial results.
+    # Only the latest partial result is kept, the worker never waits for the GUI
+    def __init__(self):
+        self.progress = 0.0
+        self.future = None
+        self._cancelled = threading.Event()
+        self._partial = None
+
+    def publish(self, partial):
+        self._partial = partial
+
+    def take_partial(self):
+        partial, self._partial = self._partial, None
+        return partial
+
+    def report(self, done, total):
+        self.progress = done / total if total else 1.0
+        if self._cancelled.is_set():
+            raise SimulationCancelled()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+class BackgroundRunner:
+    """One simulation at a time on a worker thread, results delivered on the Tk main loop.
+
+    start(work, on_done) calls work(job) on the worker and then on_done(result)
+    from widget.after(), so the callbacks may update widgets freely. While a
+    job runs start() returns None, so repeated clicks don't queue up runs.
+    on_progress(fraction) is called on every poll, on_cancel() when the job was
+    cancelled and on_error(error) when work raised. on_partial(partial) gets
+    the latest job.publish()ed partial result, at most once every frame_ms and
+    never more often than twice the time the last call took, so drawing takes
+    at most about a third of the main loop and never holds the simulation back.
+    """
+
+    def __init__(self, widget, poll_ms=50, frame_ms=FRAME_MS):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self.frame_ms = frame_ms
+        self.job = None
+        self._next_frame = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulation")
+
+    @property
+    def busy(self):
+        return self.job is not None
+
+    def start(self, work, on_done, on_progress=None, on_cancel=None, on_error=None, on_partial=None):
+        if self.busy:
+            logging.info("A simulation is already running")
+            return None
+        job = BackgroundJob()
+        job.future = self._executor.submit(work, job)
+        self.job = job
+        self._next_frame = 0.0
+        self.widget.after(self.poll_ms, self._poll, job, on_done, on_progress, on_cancel, on_error, on_partial)
+        return job
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def _poll(self, job, on_done, on_progress, on_cancel, on_error, on_partial):
+        if on_progress is not None:
+            on_progress(job.progress)
+        if not job.future.done():
+            if on_partial is not None and time.monotonic() >= self._next_frame:
+                partial = job.take_partial()
+                if partial is not None:
+                    started = time.monotonic()
+                    on_partial(partial)
+                    elapsed = time.monotonic() - started
+                    self._next_frame = time.monotonic() + max(self.frame_ms / 1000, 2 * elapsed)
+            self.widget.after(self.poll_ms, self._poll, job, on_done, on_progress, on_cancel, on_error, on_partial)
+            return
+
+        self.job = None
+        try:
+            result = job.future.result()
+        except SimulationCancelled:
+            logging.info("Simulation cancelled")
+            if on_cancel is not None:
+                on_cancel()
+            return
+        except Exception as error:
+            logging.exception("Simulation failed")
+            if on_error is not None:
+                on_error(error)
+            return
+        on_done(result)
+
+    def shutdown(self):
+        # cancel the running job and let the worker finish it off
+        self.cancel()
+        self._executor.shutdown(wait=False)
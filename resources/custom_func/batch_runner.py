@@ -0,0 +1,249 @@
+import csv
+import json
+import logging
+import os
+
+import numpy as np
+
+from .probability_sim import SimulationInputError, SimulationParams, simulate_trading
+from .rng_streams import RandomStreams, as_streams
+from .stream_stats import streaming_simulator
+from .sweep import SUMMARY_FIELDS, summarize_stats
+from .vector_sim import STAT_NAMES, simulate_paths
+
+ENGINES = ("vector", "scalar", "streaming")
+SCENARIO_FIELDS = ("initial_balance", "winrate", "risk_percent", "rr_ratio", "consecutive_L_treshold", "num_trades")
+ROW_FIELDS = ("scenario", "name", "engine", "num_paths", "seed") + SCENARIO_FIELDS + SUMMARY_FIELDS
+# stored as text in the columnar outputs, everything else is a float
+STRING_FIELDS = ("name", "engine", "seed")
+
+# accepted column names in scenario files
+ALIASES = {
+    "balance": "initial_balance",
+    "risk": "risk_percent",
+    "rr": "rr_ratio",
+    "threshold": "consecutive_L_treshold",
+    "consecutive_losses": "consecutive_L_treshold",
+    "trades": "num_trades",
+    "paths": "num_paths",
+}
+
+
+def load_scenarios(path):
+    # A list of scenario dicts from a .csv, .json or .yaml/.yml file
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="") as f:
+        if extension == ".csv":
+            scenarios = list(csv.DictReader(f))
+        elif extension == ".json":
+            scenarios = json.load(f)
+        elif extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise SimulationInputError("Error: Reading YAML scenarios needs PyYAML: pip install pyyaml") from None
+            scenarios = yaml.safe_load(f)
+        else:
+            raise SimulationInputError(f"Error: Unsupported scenario file: {path} (use .csv, .json or .yaml)")
+    if isinstance(scenarios, dict):
+        scenarios = scenarios.get("scenarios", [])
+    return [{ALIASES.get(key.strip(), key.strip()): value for key, value in scenario.items()} for scenario in scenarios]
+
+
+def _threshold(value):
+    # The rules of the CLI's --threshold: empty, 0 and "0" (a CSV cell) all leave the
+    # reducer off, anything but a non-negative integer is an error
+    text = "" if value is None else str(value).strip()
+    try:
+        threshold = int(text) if text else 0
+    except ValueError:
+        raise SimulationInputError(f"Error: Invalid threshold {value!r}.") from None
+    if threshold < 0:
+        raise SimulationInputError(f"Error: Invalid threshold {value!r}.")
+    return threshold or None
+
+
+def run_scenario(scenario, engine="vector", num_paths=1000, seed=None, keep_paths=False):
+    # Returns (params, per-path stats, balances or None) for one scenario dict
+    params = SimulationParams.from_inputs(
+        scenario.get("initial_balance"),
+        scenario.get("winrate"),
+        scenario.get("risk_percent"),
+        scenario.get("rr_ratio"),
+        scenario.get("consecutive_L_treshold"),
+        scenario.get("num_trades"),
+    )
+    if engine == "vector":
+        balances, stats = simulate_paths(
+            params.initial_balance,
+            params.winrate,
+            params.risk_percent,
+            params.rr_ratio,
+            params.num_trades,
+            num_paths,
+            params.threshold_input,
+            seed,
+            keep_paths=keep_paths,
+        )
+        return params, stats, balances
+
+    # the scalar engines run the same paths one at a time
+    per_path = []
+    balances = []
+    for path in range(num_paths):
+        if engine == "scalar":
+            result = simulate_trading(params, seed=seed, path=path)
+            per_path.append({name: getattr(result, name) for name in STAT_NAMES})
+            balances.append(result.balance_history)
+        else:
+            stats, history = streaming_simulator(
+                params.initial_balance,
+                params.winrate,
+                params.risk_percent,
+                params.rr_ratio,
+                params.threshold_input,
+                params.num_trades,
+                seed=seed,
+                keep_path=keep_paths,
+                path=path,
+            )
+            per_path.append(stats)
+            balances.append(history[1] if keep_paths else None)
+    stats = {name: np.array([row[name] for row in per_path]) for name in STAT_NAMES}
+    return params, stats, (np.array(balances) if keep_paths else None)
+
+
+def run_scenarios(
+    scenarios, engine="vector", num_paths=1000, seed=None, paths_dir=None, common_random_numbers=False, antithetic=False, cache=None
+):
+    """Run every scenario and yield one summary row (a dict of ROW_FIELDS) each.
+
+    A scenario may set its own num_paths and seed, otherwise num_paths is used
+    and it gets a child stream of seed (by its position in the list), so
+    rerunning a file with the same seed reproduces every row. With paths_dir the
+    balance matrix of each scenario is saved there as a compressed .npz.
+    Scenarios with bad inputs are logged and skipped. common_random_numbers
+    runs every scenario without its own seed on the draws of seed itself, so
+    scenarios can be compared path by path (see sweep.paired_difference);
+    antithetic pairs the paths of every scenario. With a ResultCache (see
+    result_cache), seeded scenarios run before with the same inputs are read
+    from it instead of simulated again.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, choose from {', '.join(ENGINES)}")
+    streams = as_streams(seed)
+    if antithetic:
+        streams = streams.with_antithetic()
+    if paths_dir:
+        os.makedirs(paths_dir, exist_ok=True)
+
+    for index, scenario in enumerate(scenarios):
+        name = str(scenario.get("name") or index)
+        try:
+            # checked per scenario, so a bad threshold only skips its own row
+            scenario = dict(scenario, consecutive_L_treshold=_threshold(scenario.get("consecutive_L_treshold")))
+            scenario_paths = int(scenario.get("num_paths") or num_paths)
+            if scenario.get("seed") not in (None, ""):
+                scenario_streams = RandomStreams(int(scenario["seed"]), streams.antithetic)
+            else:
+                scenario_streams = streams if common_random_numbers else streams.child(index)
+            compute = lambda: run_scenario(scenario, engine, scenario_paths, scenario_streams, keep_paths=bool(paths_dir))
+            if cache is None:
+                params, stats, balances = compute()
+            else:
+                # unseeded runs are random, a key of None always computes
+                key = None
+                if seed is not None or scenario.get("seed") not in (None, ""):
+                    fields = (scenario.get(field) for field in SCENARIO_FIELDS)
+                    key = cache.make_key(engine, *fields, scenario_streams, num_paths=scenario_paths, keep_paths=bool(paths_dir))
+                params, stats, balances = cache.get_or_compute(key, compute)
+        except (SimulationInputError, TypeError, ValueError) as error:
+            logging.error(f"Scenario {name}: {error}")
+            continue
+
+        row = {
+            "scenario": index,
+            "name": name,
+            "engine": engine,
+            "num_paths": scenario_paths,
+            "seed": scenario_streams.entropy,
+        }
+        row.update({field: getattr(params, field) for field in SCENARIO_FIELDS})
+        row.update(summarize_stats(stats, params.initial_balance))
+        if paths_dir:
+            np.savez_compressed(os.path.join(paths_dir, f"{name}.npz"), balances=balances)
+        yield row
+
+
+class CsvRowWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=ROW_FIELDS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetRowWriter:
+    # Buffers rows and writes them as row groups, so memory stays bounded
+    def __init__(self, path, group_size=4096):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SimulationInputError("Error: Parquet output needs pyarrow: pip install pyarrow") from None
+        self.pa = pa
+        self.schema = pa.schema([(field, pa.string()) if field in STRING_FIELDS else (field, pa.float64()) for field in ROW_FIELDS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.group_size = group_size
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        columns = {field: _column(field, [row[field] for row in self.rows]) for field in ROW_FIELDS}
+        self.writer.write_table(self.pa.table(columns, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+class NpzRowWriter:
+    # Collects the columns and saves them compressed when closed
+    def __init__(self, path):
+        self.path = path
+        self.columns = {field: [] for field in ROW_FIELDS}
+
+    def write(self, row):
+        for field in ROW_FIELDS:
+            self.columns[field].append(row[field])
+
+    def close(self):
+        np.savez_compressed(self.path, **{field: np.array(_column(field, values)) for field, values in self.columns.items()})
+
+
+def _column(field, values):
+    if field in STRING_FIELDS:
+        return [str(value) for value in values]
+    # a threshold of None (reducer off) is stored as NaN
+    return [float(value) if value is not None else np.nan for value in values]
+
+
+def open_writer(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        return ParquetRowWriter(path)
+    if extension == ".npz":
+        return NpzRowWriter(path)
+    return CsvRowWriter(path)
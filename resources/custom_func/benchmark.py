@@ -0,0 +1,232 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .probability_sim import SimulationParams, simulate_trading
+from .stream_stats import streaming_simulator
+from .vector_sim import simulate_paths
+
+# modules whose import time is measured, each in a fresh interpreter
+IMPORT_MODULES = (
+    "resources.custom_func.probability_sim",
+    "resources.custom_func.stream_stats",
+    "resources.custom_func.vector_sim",
+    "resources.custom_func.exact_dist",
+    "resources.custom_func.sweep",
+)
+# startup times swing far more between runs than throughput, so they get their own bound
+IMPORT_TOLERANCE = 2.0
+# the directory the modules above are imported from
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# the scalar engines are skipped for cases with more trades in total than this
+SCALAR_MAX_TRADES = 2_000_000
+# threshold of the "reducer on" cases
+REDUCER_THRESHOLD = 3
+# short cases are repeated until they took this long in total, for a stable best time
+MIN_SECONDS = 0.2
+
+
+def _run_scalar(params, num_paths, seed):
+    for path in range(num_paths):
+        simulate_trading(params, seed=seed, path=path)
+
+
+def _run_streaming(params, num_paths, seed):
+    for path in range(num_paths):
+        streaming_simulator(
+            params.initial_balance,
+            params.winrate,
+            params.risk_percent,
+            params.rr_ratio,
+            params.threshold_input,
+            params.num_trades,
+            seed=seed,
+            path=path,
+        )
+
+
+def _vector(keep_paths):
+    def run(params, num_paths, seed):
+        simulate_paths(
+            params.initial_balance,
+            params.winrate,
+            params.risk_percent,
+            params.rr_ratio,
+            params.num_trades,
+            num_paths,
+            params.threshold_input,
+            seed,
+            keep_paths=keep_paths,
+        )
+
+    return run
+
+
+# name -> (run(params, num_paths, seed), scalar?)
+ENGINES = {
+    "scalar": (_run_scalar, True),
+    "streaming": (_run_streaming, True),
+    "vector": (_vector(True), False),
+    "vector_stats": (_vector(False), False),
+}
+
+
+def time_engine(run, params, num_paths, seed=1, repeats=3):
+    # best wall time of at least `repeats` runs (more for cases shorter than
+    # MIN_SECONDS), then the peak traced memory of one more run
+    best = float("inf")
+    total = 0.0
+    runs = 0
+    while runs < repeats or (total < MIN_SECONDS and runs < 100 * repeats):
+        start = time.perf_counter()
+        run(params, num_paths, seed)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+    tracemalloc.start()
+    try:
+        run(params, num_paths, seed)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def import_times(modules=IMPORT_MODULES, repeats=5):
+    # best seconds to import each module in a fresh interpreter (startup cost of the CLI/GUI),
+    # run from the repository root whatever the current directory
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get("PYTHONPATH")))))
+    times = {}
+    for module in modules:
+        code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+        runs = []
+        for _ in range(repeats):
+            output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT, env=env).stdout
+            runs.append(float(output.strip().splitlines()[-1]))
+        times[module] = min(runs)
+    return times
+
+
+def run_benchmarks(engines=tuple(ENGINES), path_counts=(1, 100, 10000), trade_counts=(100, 1000), repeats=3, seed=1):
+    """Time every engine on every (paths, trades, reducer off/on) case.
+
+    Returns a report dict: "meta" (versions, machine, time), "imports" (see
+    import_times) and "results", one row per case with the best wall time,
+    the throughput in trades per second and the peak traced memory in MB.
+    The scalar engines skip cases above SCALAR_MAX_TRADES trades in total.
+    """
+    results = []
+    for engine in engines:
+        run, scalar = ENGINES[engine]
+        for num_paths in path_counts:
+            for num_trades in trade_counts:
+                if scalar and num_paths * num_trades > SCALAR_MAX_TRADES:
+                    continue
+                for reducer in (False, True):
+                    threshold = str(REDUCER_THRESHOLD) if reducer else None
+                    params = SimulationParams.from_inputs(50000, 0.5, 1, 2, threshold, num_trades)
+                    seconds, peak = time_engine(run, params, num_paths, seed, repeats)
+                    row = {
+                        "engine": engine,
+                        "num_paths": num_paths,
+                        "num_trades": num_trades,
+                        "reducer": reducer,
+                        "seconds": seconds,
+                        "trades_per_sec": num_paths * num_trades / seconds,
+                        "peak_mb": peak / 2**20,
+                    }
+                    logging.info(
+                        f"{engine:>12} {num_paths:>7} paths x {num_trades:>6} trades reducer={'on' if reducer else 'off':<3} "
+                        f"{row['trades_per_sec']:>14,.0f} trades/s {row['peak_mb']:>9.1f} MB"
+                    )
+                    results.append(row)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "processor": platform.processor(),
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "imports": import_times(),
+        "results": results,
+    }
+
+
+def _case(row):
+    return (row["engine"], row["num_paths"], row["num_trades"], row["reducer"])
+
+
+def compare(report, baseline, tolerance=0.2, import_tolerance=IMPORT_TOLERANCE):
+    """Cases that got slower or bigger than the baseline by more than tolerance.
+
+    Returns a list of (case, message); cases missing from either report are
+    ignored. Import times are compared too, against the looser import_tolerance.
+    """
+    regressions = []
+    previous = {_case(row): row for row in baseline["results"]}
+    for row in report["results"]:
+        old = previous.get(_case(row))
+        if old is None:
+            continue
+        speed = row["trades_per_sec"] / old["trades_per_sec"]
+        if speed < 1 - tolerance:
+            regressions.append((_case(row), f"throughput {speed:.0%} of the baseline"))
+        if old["peak_mb"] > 0 and row["peak_mb"] > old["peak_mb"] * (1 + tolerance):
+            regressions.append((_case(row), f"peak memory {row['peak_mb'] / old['peak_mb']:.0%} of the baseline"))
+    for module, seconds in report["imports"].items():
+        old = baseline.get("imports", {}).get(module)
+        if old and seconds > old * (1 + import_tolerance):
+            regressions.append((module, f"import time {seconds / old:.0%} of the baseline"))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation engines")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"comma separated, from {', '.join(ENGINES)}")
+    parser.add_argument("--paths", default="1,100,10000", help="comma separated path counts")
+    parser.add_argument("--trades", default="100,1000", help="comma separated trade counts")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per case, the best one counts")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="compare with this earlier --out file, exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown/growth against the baseline")
+    parser.add_argument("--import-tolerance", type=float, default=IMPORT_TOLERANCE, help="allowed import time growth")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    report = run_benchmarks(
+        [engine.strip() for engine in args.engines.split(",")],
+        [int(n) for n in args.paths.split(",")],
+        [int(n) for n in args.trades.split(",")],
+        args.repeats,
+    )
+    for module, seconds in report["imports"].items():
+        logging.info(f"import {module}: {seconds * 1000:.1f} ms")
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Saved {len(report['results'])} results to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.import_tolerance)
+        for case, message in regressions:
+            logging.warning(f"Regression {case}: {message}")
+        if regressions:
+            return 1
+        logging.info(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import csv
+import logging
+
+import numpy as np
+
+from .probability_sim import SimulationInputError, SimulationParams
+from .rng_streams import as_streams
+from .vector_sim import _balances_out, _run_chunks
+
+METHODS = ("iid", "block", "stationary")
+# journal columns tried in order when none is given
+R_COLUMNS = ("r_multiple", "r", "R", "r-multiple", "R_multiple")
+# trades resampled at a time: a handful of (trades, paths) arrays of this many rows per
+# chunk of paths, whatever the horizon
+BOOTSTRAP_BLOCK = 128
+
+
+def _column_index(header, first, column):
+    # index of the R-multiple column in a journal with header (None when it has none)
+    if column is not None:
+        if isinstance(column, int) or str(column).isdigit():
+            return int(column)
+        if header is None or column not in header:
+            raise SimulationInputError(f"Error: The journal has no column {column!r}.")
+        return header.index(column)
+    if header is not None:
+        for name in R_COLUMNS:
+            if name in header:
+                return header.index(name)
+    if len(first) == 1:
+        return 0
+    raise SimulationInputError("Error: The journal has several columns, give the R-multiple one.")
+
+
+def load_r_multiples(filename, column=None):
+    """The R-multiples of a trade journal CSV as a float64 array.
+
+    One trade per row: its profit or loss in units of the amount risked, so
+    a full loss is -1 and a win at 2:1 is 2. column is the name or index of
+    the R-multiple column; without one a column named r_multiple, r or R is
+    used, or the only column. The header row is optional.
+    """
+    with open(filename, newline="") as file:
+        first = next(csv.reader(file), None)
+    if not first:
+        raise SimulationInputError("Error: The trade journal is empty.")
+    try:
+        [float(value) for value in first]
+        header = None
+    except ValueError:
+        header = [name.strip() for name in first]
+    index = _column_index(header, first, column)
+    try:
+        r_multiples = np.loadtxt(filename, delimiter=",", skiprows=0 if header is None else 1, usecols=index, ndmin=1)
+    except ValueError as error:
+        raise SimulationInputError(f"Error: Invalid trade journal, {error}.") from None
+    if len(r_multiples) == 0 or not np.isfinite(r_multiples).all():
+        raise SimulationInputError("Error: The trade journal needs at least one trade and only numbers.")
+    logging.debug(f"Loaded {len(r_multiples)} trades from {filename}")
+    return r_multiples
+
+
+def _resample_blocks(r_multiples, streams, path_start, path_stop, num_trades, method, block_length):
+    # Yields (wins_by_trade, r_values) blocks of up to BOOTSTRAP_BLOCK trades, each
+    # (trades, paths). Every trade of a path takes two draws: the journal position a
+    # new run starts at, and (stationary) whether a new run starts. Within a run the
+    # journal is read in order, wrapping around at its end
+    size = len(r_multiples)
+    carry = np.zeros(path_stop - path_start, dtype=np.int64)
+    trade_start = 0
+    for uniforms in streams.uniform_blocks(path_start, path_stop, 2 * num_trades, 2 * BOOTSTRAP_BLOCK):
+        uniforms = np.ascontiguousarray(uniforms.T)
+        picks = np.minimum((uniforms[0::2] * size).astype(np.int64), size - 1)
+        trades = len(picks)
+        if method == "iid":
+            index = picks
+        else:
+            if method == "block":
+                restart = np.broadcast_to((np.arange(trade_start, trade_start + trades) % block_length == 0)[:, None], picks.shape)
+            else:
+                restart = uniforms[1::2] < 1 / block_length
+                if trade_start == 0:
+                    restart[0] = True
+            # the trade each run started at, -1 for the run carried over from the last
+            # block, which continues from the journal position carry
+            steps = np.arange(trades)[:, None]
+            last = np.where(restart, steps, -1)
+            np.maximum.accumulate(last, axis=0, out=last)
+            begin = np.where(last >= 0, np.take_along_axis(picks, np.maximum(last, 0), axis=0), carry)
+            index = begin + (steps - last)
+            index %= size
+        carry = index[-1]
+        r_values = r_multiples[index]
+        yield r_values > 0, r_values
+        trade_start += trades
+
+
+def bootstrap_paths(
+    r_multiples,
+    initial_balance,
+    risk_percent,
+    num_trades,
+    num_paths=1,
+    consecutive_L_treshold=None,
+    seed=None,
+    method="stationary",
+    block_length=10,
+    keep_paths=True,
+    path_start=0,
+    out=None,
+    dtype=np.float64,
+    sizing=None,
+):
+    """Simulate num_paths equity curves by resampling the trades of a journal.
+
+    r_multiples is an array of historical R-multiples (see load_r_multiples);
+    every trade of a path risks like simulate_paths and pays its resampled
+    R-multiple times the amount risked, so the risk reducer and the sizing
+    strategies apply unchanged (a trade with R > 0 counts as a win). method is
+    "iid" (every trade drawn independently), "block" (runs of block_length
+    consecutive journal trades) or "stationary" (runs of random length, on
+    average block_length, which keeps the journal's streaks without fixed
+    block edges). Returns (balances, stats) like simulate_paths; seed and
+    path_start work the same way, and the paths are run in chunks, so the
+    number of paths is only bound by keep_paths.
+    """
+    r_multiples = np.asarray(r_multiples, dtype=np.float64)
+    if r_multiples.ndim != 1 or len(r_multiples) == 0:
+        raise ValueError("r_multiples must be a non-empty 1-d array")
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    wins = r_multiples > 0
+    if wins.all() or not wins.any():
+        raise SimulationInputError("Error: The journal needs both winning and losing trades.")
+    # the journal's winrate and average win over average loss stand in for the fixed
+    # ones, as Kelly sizing reads them
+    winrate = wins.mean()
+    rr_ratio = r_multiples[wins].mean() / max(-r_multiples[~wins].mean(), np.finfo(np.float64).tiny)
+    params = SimulationParams.from_inputs(initial_balance, winrate, risk_percent, rr_ratio, consecutive_L_treshold, num_trades)
+    num_paths = int(num_paths)
+    if num_paths <= 0 or int(block_length) <= 0:
+        raise SimulationInputError("Error: All inputs must be positive numbers.")
+    block_length = int(block_length)
+    num_trades = params.num_trades
+
+    logging.debug(f"Bootstrapping {num_paths} paths of {num_trades} trades from {len(r_multiples)} ({method})")
+    streams = as_streams(seed)
+    balances = _balances_out(out, keep_paths, num_paths, num_trades, dtype)
+
+    def outcome_blocks(start, stop, block_trades):
+        return _resample_blocks(r_multiples, streams, path_start + start, path_start + stop, num_trades, method, block_length)
+
+    stats = _run_chunks(outcome_blocks, params, num_paths, balances, sizing, resampled=True)
+    return balances, stats
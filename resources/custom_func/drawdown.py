@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from .vector_sim import CHUNK_PATHS
+
+
+@dataclass
+class DrawdownReport:
+    # Per-path drawdown figures of a (num_paths, num_trades + 1) balance matrix. Indices
+    # are trade numbers (0 = the initial balance). recovery is -1 for paths still under
+    # water at the end; duration counts the trades from the peak to the recovery, or to
+    # the last trade when there is none. Paths that never draw down have everything at 0
+    max_drawdown: np.ndarray
+    peak: np.ndarray
+    trough: np.ndarray
+    recovery: np.ndarray
+    duration: np.ndarray
+    underwater: Optional[np.ndarray] = None
+
+    @property
+    def recovered(self):
+        return self.recovery >= 0
+
+    def worst_path(self):
+        return int(np.argmax(self.max_drawdown))
+
+
+def underwater_curve(balances, out=None):
+    """Drawdown (%) below the running peak after every trade, for every path.
+
+    balances is a (num_paths, num_trades + 1) matrix like simulate_paths
+    returns (or a single path); the running peak is one np.maximum.accumulate
+    along the trades, so the same divisions as the engines give the same
+    values. out may be a float array of the same shape to write into.
+    """
+    balances = np.asarray(balances, dtype=np.float64)
+    peak = np.maximum.accumulate(balances, axis=-1)
+    curve = np.subtract(peak, balances, out=out)
+    curve /= peak
+    curve *= 100
+    return curve
+
+
+def _chunk_report(balances, underwater):
+    trade_index = np.arange(balances.shape[1])
+    rows = np.arange(balances.shape[0])
+    peak_balance = np.maximum.accumulate(balances, axis=1)
+    np.subtract(peak_balance, balances, out=underwater)
+    underwater /= peak_balance
+
+    trough = np.argmax(underwater, axis=1)
+    max_drawdown = underwater[rows, trough] * 100
+    # the peak before the trough is the last trade that set (or matched) the running peak
+    peak_at = np.where(balances >= peak_balance, trade_index, 0)
+    np.maximum.accumulate(peak_at, axis=1, out=peak_at)
+    peak = peak_at[rows, trough]
+    # the recovery is the first trade after the trough back at the peak balance
+    back = (balances >= peak_balance[rows, trough][:, None]) & (trade_index > trough[:, None])
+    recovery = np.where(back.any(axis=1), np.argmax(back, axis=1), -1)
+
+    flat = max_drawdown == 0
+    peak[flat] = 0
+    trough[flat] = 0
+    recovery[flat] = 0
+    duration = np.where(recovery >= 0, recovery, balances.shape[1] - 1) - peak
+    return max_drawdown, peak, trough, recovery, duration
+
+
+def drawdown_report(balances, keep_underwater=False):
+    """Max drawdown, peak/trough/recovery trades and duration of every path at once.
+
+    balances is a (num_paths, num_trades + 1) matrix (a single path is taken as
+    one row). The paths are processed CHUNK_PATHS at a time, so the temporary
+    matrices stay small even for 1M paths; with keep_underwater the full
+    underwater curves (%) are returned too, which takes as much memory as
+    balances. max_drawdown matches the max_drawdown stat of the engines.
+    Returns a DrawdownReport.
+    """
+    balances = np.asarray(balances)
+    if balances.ndim == 1:
+        balances = balances[None, :]
+    num_paths, num_points = balances.shape
+    report = DrawdownReport(
+        max_drawdown=np.empty(num_paths),
+        peak=np.empty(num_paths, dtype=np.int64),
+        trough=np.empty(num_paths, dtype=np.int64),
+        recovery=np.empty(num_paths, dtype=np.int64),
+        duration=np.empty(num_paths, dtype=np.int64),
+        underwater=np.empty((num_paths, num_points)) if keep_underwater else None,
+    )
+    scratch = None
+    for start in range(0, num_paths, CHUNK_PATHS):
+        stop = min(start + CHUNK_PATHS, num_paths)
+        chunk = np.asarray(balances[start:stop], dtype=np.float64)
+        if keep_underwater:
+            underwater = report.underwater[start:stop]
+        else:
+            if scratch is None or scratch.shape[0] != stop - start:
+                scratch = np.empty((stop - start, num_points))
+            underwater = scratch
+        figures = _chunk_report(chunk, underwater)
+        for values, name in zip(figures, ("max_drawdown", "peak", "trough", "recovery", "duration")):
+            getattr(report, name)[start:stop] = values
+        if keep_underwater:
+            underwater *= 100
+    return report
+
+
+def max_drawdown_point(balance_history):
+    # (trade, balance) of the deepest point of one path, for marking it on a plot
+    balances = np.asarray(balance_history, dtype=np.float64)
+    trough = int(drawdown_report(balances).trough[0])
+    return trough, float(balances[trough])
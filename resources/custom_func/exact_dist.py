@@ -0,0 +1,219 @@
+import logging
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from .probability_sim import SimulationInputError
+from .vector_sim import simulate_paths
+
+# log-balance buckets of the reducer DP, the bucket width bounds the error of its percentiles
+DEFAULT_BUCKETS = 20000
+# half-width of the DP grid in standard deviations of the log final balance, the mass
+# beyond it is negligible
+SPREAD_SIGMAS = 12
+# largest standard deviation of the rounding noise the buckets add to the log final
+# balance, as a fraction of its own (0.2 widens the percentiles by at most 2%), or
+# absolute (0.01 moves them by about 1% of the balance), whichever is larger
+MAX_ROUNDING = 0.2
+ROUNDING_FLOOR = 0.01
+
+
+@dataclass
+class OutcomeDistribution:
+    # Distribution of the final balance: balances sorted ascending with their probabilities.
+    # exact is False for the bucketed DP, whose balances are bucket centres
+    balances: np.ndarray
+    probabilities: np.ndarray
+    initial_balance: float
+    exact: bool = True
+
+    def mean(self):
+        return float(np.dot(self.balances, self.probabilities))
+
+    def percentile(self, q):
+        # smallest balance with at least q% of the probability at or below it
+        cdf = np.cumsum(self.probabilities)
+        index = np.searchsorted(cdf, np.asarray(q) / 100 * cdf[-1] - 1e-12)
+        return self.balances[np.minimum(index, len(self.balances) - 1)]
+
+    def prob_below(self, balance):
+        return float(self.probabilities[self.balances < balance].sum())
+
+    def prob_profit(self):
+        return float(self.probabilities[self.balances > self.initial_balance].sum())
+
+    def summary(self):
+        p5, p50, p95 = self.percentile([5, 50, 95])
+        kind = "exact" if self.exact else "bucketed"
+        return (
+            f"Final Balance ({kind}): mean ${self.mean():.2f}, median ${p50:.2f}\n"
+            f"Final Balance 5th-95th percentile: ${p5:.2f} - ${p95:.2f}\n"
+            f"Probability of Profit: {self.prob_profit() * 100:.2f}%"
+        )
+
+
+def _binomial_pmf(num_trades, winrate):
+    # P(k wins) for k = 0..num_trades, through logs so big num_trades don't overflow
+    k = np.arange(1, num_trades + 1)
+    log_choose = np.concatenate(([0.0], np.cumsum(np.log((num_trades - k + 1) / k))))
+    wins = np.arange(num_trades + 1)
+    if winrate >= 1:
+        return (wins == num_trades).astype(float)
+    return np.exp(log_choose + wins * math.log(winrate) + (num_trades - wins) * math.log1p(-winrate))
+
+
+def _shift_add(out, mass, steps):
+    # out += mass moved `steps` buckets up (fractional steps split between the two
+    # neighbouring buckets, which keeps the mean log-balance exact). Mass moved past
+    # either end piles up in the end bucket, so no probability is lost
+    whole = math.floor(steps)
+    frac = steps - whole
+    size = mass.shape[-1]
+    for offset, weight in ((whole, 1 - frac), (whole + 1, frac)):
+        if weight == 0:
+            continue
+        offset = max(-size, min(size, offset))
+        if offset >= 0:
+            out[..., offset:] += weight * mass[..., : size - offset]
+            out[..., -1] += weight * mass[..., size - offset :].sum(axis=-1)
+        else:
+            out[..., :offset] += weight * mass[..., -offset:]
+            out[..., 0] += weight * mass[..., :-offset].sum(axis=-1)
+
+
+def exact_distribution(params, buckets=DEFAULT_BUCKETS):
+    """Distribution of the final balance of params without sampling.
+
+    With fixed-fraction risk the final balance only depends on how many trades
+    were won, so without the risk reducer it is binomial and exact. With the
+    reducer it is found by dynamic programming over (losing streak, log-balance
+    bucket), one trade at a time; `buckets` sets the resolution. Returns an
+    OutcomeDistribution.
+    """
+    initial_balance = params.initial_balance
+    winrate = min(params.winrate, 1.0)
+    risk = params.risk_percent / 100
+    rr_ratio = params.rr_ratio
+    num_trades = params.num_trades
+    threshold = params.consecutive_L_treshold
+
+    if threshold is None or threshold >= num_trades or winrate >= 1:
+        # the reducer never kicks in before the last trade (or never loses a trade)
+        wins = np.arange(num_trades + 1)
+        balances = initial_balance * (1 + risk * rr_ratio) ** wins * (1 - risk) ** (num_trades - wins)
+        probabilities = _binomial_pmf(num_trades, winrate)
+        order = np.argsort(balances, kind="stable")
+        return OutcomeDistribution(balances[order], probabilities[order], initial_balance)
+
+    if risk >= 1:
+        raise SimulationInputError("Error: The exact distribution with the risk reducer needs a risk below 100%.")
+    # log growth of one trade: win/loss at full/half risk
+    win_full, win_half = math.log1p(risk * rr_ratio), math.log1p(risk * rr_ratio / 2)
+    loss_full, loss_half = math.log1p(-risk), math.log1p(-risk / 2)
+    # The grid spans the starting log-balance 0 and, at every trade, the log-balances
+    # within SPREAD_SIGMAS standard deviations of the full-risk binomial around the
+    # full- and half-risk drifts (the reducer lands in between and only narrows the
+    # spread), so no mass that matters leaves it on its way to the end. Not every
+    # reachable one: every trade adds rounding noise of up to half a bucket width, so
+    # the buckets need to be much finer than the spread of the outcome, not of the
+    # worst case
+    step_sigma = math.sqrt(winrate * (1 - winrate)) * (win_full - loss_full)
+    drift_full = winrate * win_full + (1 - winrate) * loss_full
+    drift_half = winrate * win_half + (1 - winrate) * loss_half
+    trades = np.arange(num_trades + 1)
+    spread = SPREAD_SIGMAS * step_sigma * np.sqrt(trades)
+    low = float(np.maximum(trades * loss_full, trades * min(drift_full, drift_half) - spread).min())
+    high = float(np.minimum(trades * win_full, trades * max(drift_full, drift_half) + spread).max())
+    width = (high - low) / (buckets - 2)
+    # The most frequent move (by the long-run share of trades at half risk) moves whole
+    # buckets, so only the rarer ones add rounding noise: at extreme winrates nearly
+    # every trade is the same move. Widening the buckets to fit keeps high on the grid
+    half_share = (1 - winrate) ** threshold
+    moves = {
+        win_full: winrate * (1 - half_share),
+        loss_full: (1 - winrate) * (1 - half_share),
+        win_half: winrate * half_share,
+        loss_half: (1 - winrate) * half_share,
+    }
+    step = abs(max(moves, key=moves.get))
+    if step >= width:
+        width = step / math.floor(step / width)
+    # log-balance 0 on a bucket edge (low moves down by less than a bucket, the spare
+    # bucket keeps high on the grid), so every trade rounds the same way
+    origin = math.ceil(-low / width)
+    low = -origin * width
+
+    def rounding(win, loss):
+        # variance one trade's split between two buckets adds, in squared buckets
+        win_split, loss_split = win / width % 1, loss / width % 1
+        return winrate * win_split * (1 - win_split) + (1 - winrate) * loss_split * (1 - loss_split)
+
+    # mass[s, b]: probability of a losing streak of s (s == threshold means at least
+    # threshold, i.e. the next trade is at half risk) and log-balance in bucket b
+    mass = np.zeros((threshold + 1, buckets))
+    start = np.zeros((1, buckets))
+    start[0, origin] = 1.0
+    # the first trade is always at full risk, it starts the chain from streak 0
+    _shift_add(mass[:1], winrate * start, win_full / width)
+    _shift_add(mass[min(1, threshold) : min(1, threshold) + 1], (1 - winrate) * start, loss_full / width)
+
+    new_mass = np.zeros_like(mass)
+    # buckets that can hold any mass, widened by one trade's moves (plus the split
+    # into a second bucket) every step, the rest of the grid is never touched
+    lo = max(0, origin + math.floor(loss_full / width))
+    hi = min(buckets, origin + math.ceil(win_full / width) + 1)
+    # expected number of trades at half risk, for the rounding noise
+    half_trades = 0.0
+    for trade in range(1, num_trades):
+        lo = max(0, lo - math.ceil(-loss_full / width) - 1)
+        hi = min(buckets, hi + math.ceil(win_full / width) + 1)
+        window, new_window = mass[:, lo:hi], new_mass[:, lo:hi]
+        new_window.fill(0.0)
+        full, half = window[:threshold], window[threshold:]
+        half_trades += half.sum()
+        _shift_add(new_window[:1], winrate * full.sum(axis=0, keepdims=True), win_full / width)
+        _shift_add(new_window[:1], winrate * half, win_half / width)
+        _shift_add(new_window[1:], (1 - winrate) * full, loss_full / width)
+        _shift_add(new_window[threshold:], (1 - winrate) * half, loss_half / width)
+        mass, new_mass = new_mass, mass
+
+    logging.debug(f"Reducer DP over {num_trades} trades, {threshold + 1} streak states, {buckets} buckets")
+    log_balances = low + width * np.arange(buckets)
+    probabilities = mass.sum(axis=0)
+    # The rounding noise adds to the variance of the log final balance, refuse results
+    # it visibly smears (a far-drifting, narrow outcome needs more buckets)
+    noise = width**2 * ((num_trades - half_trades) * rounding(win_full, loss_full) + half_trades * rounding(win_half, loss_half))
+    mean = np.dot(log_balances, probabilities)
+    variance = np.dot((log_balances - mean) ** 2, probabilities) - noise
+    if noise > max(MAX_ROUNDING**2 * variance, ROUNDING_FLOOR**2):
+        raise SimulationInputError(
+            f"Error: The exact distribution of these {num_trades} trades needs more than {buckets} buckets, "
+            "simulate them instead."
+        )
+    return OutcomeDistribution(initial_balance * np.exp(log_balances), probabilities, initial_balance, exact=False)
+
+
+def check_against_monte_carlo(params, num_paths=100000, seed=None, percentiles=(5, 25, 50, 75, 95), buckets=DEFAULT_BUCKETS):
+    # {statistic: (exact, sampled)} for the mean, probability of profit and percentiles
+    # of the final balance, the sampled side from the vectorized engine
+    distribution = exact_distribution(params, buckets)
+    _, stats = simulate_paths(
+        params.initial_balance,
+        params.winrate,
+        params.risk_percent,
+        params.rr_ratio,
+        params.num_trades,
+        num_paths,
+        params.threshold_input,
+        seed,
+        keep_paths=False,
+    )
+    final_balance = stats["final_balance"]
+    comparison = {
+        "mean": (distribution.mean(), float(final_balance.mean())),
+        "prob_profit": (distribution.prob_profit(), float((final_balance > params.initial_balance).mean())),
+    }
+    for q, exact, sampled in zip(percentiles, distribution.percentile(percentiles), np.percentile(final_balance, percentiles)):
+        comparison[f"p{q}"] = (float(exact), float(sampled))
+    return comparison
@@ -0,0 +1,116 @@
+import numpy as np
+
+# vertices per drawn line: a band edge, the median or a sample path. Whatever the
+# path length or count, a fan chart never draws more than about
+# (len(percentiles) + sample paths) * MAX_LINE_POINTS vertices
+MAX_LINE_POINTS = 600
+FAN_COLOR = "#f0a030"
+SAMPLE_COLOR = "#3a6ea5"
+
+
+def ensemble_bands(balances, percentiles=(5, 25, 50, 75, 95)):
+    # (len(percentiles), num_trades + 1) percentiles across the paths of a
+    # (num_paths, num_trades + 1) balance matrix, one vectorized np.percentile
+    return np.percentile(np.asarray(balances), percentiles, axis=0)
+
+
+def _bin_edges(num_points, num_bins):
+    return np.linspace(0, num_points, num_bins + 1).astype(np.int64)
+
+
+def envelope(values, max_points=MAX_LINE_POINTS, upper=True):
+    """Min-max downsampling onto a shared grid, for filled bands.
+
+    values is (lines, num_points); every bin of consecutive points becomes two
+    vertices (its first and last trade) at the bin's max (upper) or min, so the
+    band never looks narrower than it is. Returns (trades, downsampled values).
+    """
+    values = np.atleast_2d(values)
+    num_points = values.shape[1]
+    if num_points <= max_points:
+        return np.arange(num_points), values
+    edges = _bin_edges(num_points, max_points // 2)
+    reduce = np.maximum if upper else np.minimum
+    extremes = reduce.reduceat(values, edges[:-1], axis=1)
+    trades = np.column_stack((edges[:-1], edges[1:] - 1)).ravel()
+    return trades, np.repeat(extremes, 2, axis=1)
+
+
+def minmax_line(values, max_points=MAX_LINE_POINTS):
+    # Min-max downsampling of one line: the lowest and highest point of every bin,
+    # in the order they occur, so spikes survive. Returns (trades, values)
+    values = np.asarray(values)
+    num_points = len(values)
+    if num_points <= max_points:
+        return np.arange(num_points), values
+    num_bins = max_points // 2
+    edges = _bin_edges(num_points, num_bins)
+    width = np.diff(edges)
+    # pad the bins to the same width with their own first value to argmin/argmax them together
+    columns = np.arange(width.max())
+    index = np.minimum(edges[:-1, None] + columns, edges[1:, None] - 1)
+    binned = values[index]
+    lows, highs = index[np.arange(num_bins), binned.argmin(axis=1)], index[np.arange(num_bins), binned.argmax(axis=1)]
+    trades = np.sort(np.column_stack((lows, highs)), axis=1).ravel()
+    return trades, values[trades]
+
+
+def lttb(values, max_points=MAX_LINE_POINTS):
+    """Largest-Triangle-Three-Buckets downsampling of one or more lines.
+
+    values is (lines, num_points) over trades 0..num_points - 1. Keeps the
+    first and last point and, per bucket, the point spanning the largest
+    triangle with the previous pick and the next bucket's mean; the lines are
+    processed together, one bucket at a time. Returns (trades, values), both
+    (lines, max_points).
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    lines, num_points = values.shape
+    if num_points <= max_points:
+        trades = np.broadcast_to(np.arange(num_points), values.shape)
+        return trades, values
+    rows = np.arange(lines)
+    edges = 1 + _bin_edges(num_points - 2, max_points - 2)
+    picked = np.empty((lines, max_points), dtype=np.int64)
+    picked[:, 0] = 0
+    picked[:, -1] = num_points - 1
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 <= max_points - 2 else num_points
+        next_x = (stop + next_stop - 1) / 2
+        next_y = values[:, stop:next_stop].mean(axis=1)
+        prev_x = picked[:, bucket]
+        prev_y = values[rows, prev_x]
+        x = np.arange(start, stop)
+        y = values[:, start:stop]
+        area = np.abs((prev_x[:, None] - next_x) * (y - prev_y[:, None]) - (prev_x[:, None] - x) * (next_y - prev_y)[:, None])
+        picked[:, bucket + 1] = start + area.argmax(axis=1)
+    return picked, values[rows[:, None], picked]
+
+
+def plot_fan(ax, bands, percentiles=(5, 25, 50, 75, 95), samples=None, sample_trades=None, max_points=MAX_LINE_POINTS):
+    """Draw a fan chart: nested percentile bands, the median and a few sample paths.
+
+    bands is (len(percentiles), num_points) as from ensemble_bands, percentiles
+    in ascending order with the median in the middle. samples is an optional
+    (paths, points) array, at trades sample_trades (default 0..points - 1).
+    Every line is downsampled to max_points vertices first, so the draw time
+    doesn't grow with the ensemble. Returns the list of artists.
+    """
+    artists = []
+    if samples is not None:
+        samples = np.atleast_2d(samples)
+        trades, values = lttb(samples, max_points)
+        if sample_trades is not None:
+            trades = np.asarray(sample_trades)[trades]
+        for path_trades, path_values in zip(trades, values):
+            artists += ax.plot(path_trades, path_values, color=SAMPLE_COLOR, linewidth=0.5, alpha=0.4)
+
+    middle = len(percentiles) // 2
+    for index in range(middle):
+        trades, lower = envelope(bands[index], max_points, upper=False)
+        _, upper = envelope(bands[-index - 1], max_points, upper=True)
+        artists.append(ax.fill_between(trades, lower[0], upper[0], color=FAN_COLOR, alpha=0.15, linewidth=0))
+    trades, median = minmax_line(bands[middle], max_points)
+    artists += ax.plot(trades, median, color=FAN_COLOR, linewidth=1.5, label=f"p{percentiles[middle]}")
+    return artists
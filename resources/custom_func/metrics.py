@@ -0,0 +1,172 @@
+# Opt-in instrumentation: per-phase timers and counters, an optional cProfile and
+# tracemalloc capture, and a JSON dump of it all. Off by default, and while off
+# phase() and count() cost one global lookup, so they stay in the hot code paths
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# JSON file to dump the metrics to; setting it turns the metrics on in the GUIs
+METRICS_ENV = "SIM_METRICS"
+# comma separated captures for the GUIs: "profile", "memory"
+CAPTURE_ENV = "SIM_METRICS_CAPTURE"
+# functions kept from the profile, by cumulative time
+PROFILE_TOP = 25
+
+_active = None
+_off = nullcontext()
+
+
+class Metrics:
+    """Timers and counters of one process, filled while enabled.
+
+    phase(name) times a block: every phase keeps its total seconds and number
+    of calls, nested phases count in full in both. count(name, n) adds to a
+    counter. capture() wraps a run in cProfile (profile=True) and tracemalloc
+    (memory=True); repeated captures add up. Safe to use from the GUI's worker
+    and main threads at the same time.
+    """
+
+    def __init__(self, profile=False, memory=False, filename=None):
+        self.phases = {}
+        self.counters = {}
+        self.profile = profile
+        self.memory = memory
+        self.filename = filename
+        self.peak_memory = 0
+        self._profiler = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                seconds, calls = self.phases.get(name, (0.0, 0))
+                self.phases[name] = (seconds + elapsed, calls + 1)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def capture(self):
+        # cProfile only sees the thread it was enabled on, so capture on the thread
+        # that does the work
+        if self.profile:
+            if self._profiler is None:
+                self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        tracing = self.memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if tracing:
+                self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            if self.profile:
+                self._profiler.disable()
+
+    def profile_rows(self, top=PROFILE_TOP):
+        if self._profiler is None:
+            return []
+        stats = pstats.Stats(self._profiler)
+        rows = []
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append(
+                {"function": f"{os.path.basename(filename)}:{line}({function})", "calls": calls, "tottime": tottime, "cumtime": cumtime}
+            )
+        rows.sort(key=lambda row: row["cumtime"], reverse=True)
+        return rows[:top]
+
+    def to_dict(self):
+        with self._lock:
+            report = {
+                "phases": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.phases.items()},
+                "counters": dict(self.counters),
+            }
+        if self.memory:
+            report["peak_memory_mb"] = self.peak_memory / 2**20
+        if self.profile:
+            report["profile"] = self.profile_rows()
+        return report
+
+    def summary(self):
+        lines = []
+        with self._lock:
+            for name, (seconds, calls) in sorted(self.phases.items(), key=lambda item: -item[1][0]):
+                lines.append(f"{name}: {seconds * 1000:.2f} ms in {calls} call(s)")
+            for name, value in self.counters.items():
+                lines.append(f"{name}: {value}")
+        if self.memory:
+            lines.append(f"Peak memory: {self.peak_memory / 2**20:.1f} MB")
+        return "\n".join(lines)
+
+    def dump(self, filename=None):
+        filename = filename or self.filename
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logging.info(f"Saved the metrics to {filename}")
+
+
+def enable(metrics=None):
+    # makes metrics (a new Metrics by default) the one phase() and count() report to
+    global _active
+    _active = metrics if metrics is not None else Metrics()
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def active():
+    return _active
+
+
+def enable_from_env():
+    # the GUIs' switch: a Metrics dumping to $SIM_METRICS, or None when it isn't set
+    filename = os.environ.get(METRICS_ENV)
+    if not filename:
+        return None
+    captures = {name.strip() for name in os.environ.get(CAPTURE_ENV, "").split(",")}
+    return enable(Metrics("profile" in captures, "memory" in captures, filename))
+
+
+def phase(name):
+    return _off if _active is None else _active.phase(name)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+def captured(work):
+    # work wrapped in the active metrics' capture, or work itself while they're off
+    metrics = _active
+    if metrics is None:
+        return work
+
+    def run(*args, **kwargs):
+        with metrics.capture():
+            return work(*args, **kwargs)
+
+    return run
+
+
+def dump():
+    # writes the active metrics to their file, if they have one
+    if _active is not None and _active.filename:
+        _active.dump()
@@ -0,0 +1,274 @@
+# Solves for the winrate (or risk) at which a goal on the outcome distribution is just
+# met, e.g. "95% of paths end in profit". Imported by the package, so numpy and the
+# engines are only imported once something is solved
+import itertools
+import logging
+import math
+import re
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from .probability_sim import SimulationParams
+
+# stats the exact method can evaluate without sampling
+EXACT_STATS = ("final_balance", "total_return", "max_drawdown")
+# the batched Monte Carlo pass steps this many (pair, path) columns together, this many
+# trades at a time, small enough for the per-trade arrays to stay in cache; every pair
+# takes 4 codes of the engine's uint8 code table
+BATCH_COLUMNS = 16384
+BATCH_TRADES = 256
+BATCH_PAIRS = 64
+_GOAL = re.compile(r"^P\((\w+)\s*([<>])\s*(-?[\d.]+)\)\s*([<>])=?\s*([\d.]+)$")
+
+
+@dataclass(frozen=True)
+class Goal:
+    # P(stat > level) (or < level when above is False) must be at least probability
+    # (or at most, when at_least is False). Levels are in the stat's own units, e.g.
+    # percent for total_return and max_drawdown
+    stat: str
+    level: float
+    above: bool
+    probability: float
+    at_least: bool
+
+    @classmethod
+    def parse(cls, text):
+        # "P(total_return>0)>=0.95" or "P(max_drawdown>25)<=0.05"
+        match = _GOAL.match(text.replace(" ", ""))
+        if match is None:
+            raise ValueError(f"Invalid goal {text!r}, expected e.g. 'P(max_drawdown>25)<=0.05'")
+        stat, side, level, bound, probability = match.groups()
+        from .vector_sim import STAT_NAMES
+
+        if stat not in STAT_NAMES:
+            raise ValueError(f"Unknown stat {stat!r}, choose from {', '.join(STAT_NAMES)}")
+        return cls(stat, float(level), side == ">", float(probability), bound == ">")
+
+    @property
+    def label(self):
+        return f"P({self.stat}{'>' if self.above else '<'}{self.level:g}){'>=' if self.at_least else '<='}{self.probability:g}"
+
+    def met(self, probability):
+        return probability >= self.probability if self.at_least else probability <= self.probability
+
+
+def _exact_probability(goal, params):
+    # P(event) of goal without sampling: the final balance distribution or the drawdown
+    # first passage, both by dynamic programming
+    if goal.stat == "max_drawdown":
+        from .risk_of_ruin import drawdown_first_passage
+
+        hit = drawdown_first_passage(params, goal.level).prob_hit()
+        return hit if goal.above else 1 - hit
+    from .exact_dist import exact_distribution
+
+    distribution = exact_distribution(params)
+    if goal.stat == "total_return":
+        level = params.initial_balance * (1 + goal.level / 100)
+    else:
+        level = goal.level
+    if goal.above:
+        return float(distribution.probabilities[distribution.balances > level].sum())
+    return distribution.prob_below(level)
+
+
+class _PairReducers:
+    # The sizing of a batch of (pair, path) columns for the batch engine: the risk
+    # reducer of every pair, each with its own threshold. The level of a column is
+    # 2 * its pair's place in the batch, + 1 once halved, so every pair indexes its own
+    # rows of the code table (see _monte_carlo_probabilities)
+    proportional = True
+    needs_win_streaks = False
+
+    def __init__(self, pair_levels, thresholds):
+        self.pair_levels = pair_levels
+        self.thresholds = thresholds
+
+    def next_levels(self, loss_streaks, win_streaks):
+        return (loss_streaks >= self.thresholds).view(self.pair_levels.dtype) + self.pair_levels
+
+
+def _monte_carlo_probabilities(goal, params_list, draws_by_trade):
+    # P(event) for every params at once, on the same (num_trades, num_paths) uniforms
+    # (common random numbers, so an estimate moves with the inputs and not the noise).
+    # The paths of all params run side by side through the batch engine in cache-sized
+    # chunks of up to BATCH_PAIRS params, with the risk per column and the reducer of
+    # every params in one code table: bit for bit what simulate_paths gives each alone
+    import numpy as np
+
+    from .vector_sim import _PathState
+
+    num_trades, num_paths = draws_by_trade.shape
+    initial_balance = params_list[0].initial_balance
+    count = len(params_list)
+    winrates = np.array([params.winrate for params in params_list])
+    risks = np.array([params.risk_percent / 100 for params in params_list])
+    rr_ratios = np.array([params.rr_ratio for params in params_list])
+    # a threshold the streaks never reach when the reducer is off
+    thresholds = np.array([num_trades + 1 if p.consecutive_L_treshold is None else p.consecutive_L_treshold for p in params_list])
+    # the code table of every params: a loss, a win, a halved loss, a halved win
+    tables = np.column_stack((np.full(count, -1.0), rr_ratios, np.full(count, -0.5), 0.5 * rr_ratios))
+
+    values = np.empty((count, num_paths))
+    # chunks of whole params when the paths are few, of path slices of one when many
+    group = max(1, min(BATCH_PAIRS, BATCH_COLUMNS // num_paths))
+    width = min(num_paths, BATCH_COLUMNS)
+    for first in range(0, count, group):
+        pairs = slice(first, first + group)
+        pairs_in_chunk = len(winrates[pairs])
+        for path_start in range(0, num_paths, width):
+            paths = slice(path_start, path_start + width)
+            paths_in_chunk = len(range(num_paths)[paths])
+            column = lambda values: np.repeat(values, paths_in_chunk)
+            pair_levels = column(np.arange(0, 2 * pairs_in_chunk, 2, dtype=np.uint8))
+            sizing = _PairReducers(pair_levels, column(thresholds[pairs]))
+            state = _PathState(pairs_in_chunk * paths_in_chunk, initial_balance)
+            state.risk_level = pair_levels.copy()
+            for start in range(0, num_trades, BATCH_TRADES):
+                draws = draws_by_trade[start : start + BATCH_TRADES, paths]
+                wins_by_trade = (draws[:, None, :] <= winrates[pairs, None]).reshape(len(draws), -1)
+                state.advance(wins_by_trade, sizing, column(risks[pairs]), tables[pairs].ravel())
+            values[pairs, paths] = state.stats(initial_balance, num_trades)[goal.stat].reshape(pairs_in_chunk, paths_in_chunk)
+
+    hits = values > goal.level if goal.above else values < goal.level
+    return hits.mean(axis=1).tolist()
+
+
+@dataclass
+class Solution:
+    # value: the solved winrate or risk percent, nan when the goal can't be met within
+    # the search bounds; probability: the goal's probability at value
+    rr_ratio: float
+    threshold: Optional[int]
+    value: float
+    probability: float
+
+    @property
+    def solved(self):
+        return not math.isnan(self.value)
+
+
+def _bisect(probabilities, goal, lows, highs, increasing, tolerance):
+    # Lockstep bisection of every problem i on [lows[i], highs[i]]: each round,
+    # probabilities(problems, xs) evaluates the midpoints of all unfinished problems in
+    # one batch. increasing: the goal is met above the root (a winrate), else below it
+    # (a risk). Returns (values, probabilities)
+    count = len(lows)
+    lows, highs = list(lows), list(highs)
+    problems = list(range(count))
+    inner = probabilities(problems, lows if increasing else highs)
+    outer = probabilities(problems, highs if increasing else lows)
+    values = [math.nan] * count
+    found = [math.nan] * count
+    active = []
+    for i in range(count):
+        if goal.met(inner[i]):
+            # met on the whole interval
+            values[i], found[i] = (lows[i], inner[i]) if increasing else (highs[i], inner[i])
+        elif goal.met(outer[i]):
+            values[i], found[i] = (highs[i], outer[i]) if increasing else (lows[i], outer[i])
+            active.append(i)
+        else:
+            found[i] = outer[i]
+
+    rounds = 0
+    while active:
+        rounds += 1
+        still = []
+        middles = [(lows[i] + highs[i]) / 2 for i in active]
+        for i, middle, p in zip(active, middles, probabilities(active, middles)):
+            if goal.met(p):
+                values[i], found[i] = middle, p
+                if increasing:
+                    highs[i] = middle
+                else:
+                    lows[i] = middle
+            elif increasing:
+                lows[i] = middle
+            else:
+                highs[i] = middle
+            if highs[i] - lows[i] > tolerance:
+                still.append(i)
+        active = still
+    logging.debug(f"Solved {count} problems in {rounds} bisection rounds")
+    return values, found
+
+
+def _solve(goal, solve_for, fixed, rr_ratios, thresholds, num_trades, initial_balance, method, num_paths, seed, tolerance, bounds):
+    if method not in ("exact", "monte_carlo"):
+        raise ValueError("method must be 'exact' or 'monte_carlo'")
+    if method == "exact" and goal.stat not in EXACT_STATS:
+        raise ValueError(f"The exact method only covers {', '.join(EXACT_STATS)}, use method='monte_carlo'")
+    pairs = list(itertools.product(rr_ratios, thresholds))
+    # every pair validated up front, the solved input is replaced on each evaluation
+    winrate, risk_percent = (1, fixed) if solve_for == "winrate" else (fixed, 1)
+    base = [SimulationParams.from_inputs(initial_balance, winrate, risk_percent, rr, threshold, num_trades) for rr, threshold in pairs]
+    draws_by_trade = None
+    if method == "monte_carlo":
+        from .rng_streams import as_streams
+
+        # drawn once, every evaluation runs on these same paths
+        draws_by_trade = as_streams(seed).uniforms(0, int(num_paths), int(num_trades)).T.copy()
+
+    def probabilities(problems, xs):
+        field = "winrate" if solve_for == "winrate" else "risk_percent"
+        params_list = [replace(base[i], **{field: x}) for i, x in zip(problems, xs)]
+        if method == "exact":
+            # each pair has its own grid, so the dynamic programs run one by one
+            return [_exact_probability(goal, params) for params in params_list]
+        return _monte_carlo_probabilities(goal, params_list, draws_by_trade)
+
+    low, high = bounds
+    values, found = _bisect(probabilities, goal, [low] * len(pairs), [high] * len(pairs), solve_for == "winrate", tolerance)
+    return [Solution(params.rr_ratio, params.consecutive_L_treshold, value, p) for params, value, p in zip(base, values, found)]
+
+
+def min_winrate_calculator(
+    goal,
+    rr_ratios,
+    thresholds=(None,),
+    risk_percent=1,
+    num_trades=100,
+    initial_balance=50000,
+    method="exact",
+    num_paths=20000,
+    seed=None,
+    tolerance=1e-4,
+):
+    """Smallest winrate that meets goal, for every (rr, threshold) pair at once.
+
+    goal is a Goal or its text ("P(total_return>0)>=0.95"). Every pair of
+    rr_ratios x thresholds (None or 0 = reducer off) is solved by bisection on
+    (0, 1], all pairs in lockstep. method="exact" evaluates the goal without
+    sampling (final balance and max drawdown goals); "monte_carlo" estimates it
+    from num_paths paths drawn with the same random numbers at every winrate,
+    so the estimate is monotone in the winrate and the bisection is stable.
+    Returns a list of Solution, value nan where even a winrate of 1 fails.
+    """
+    goal = Goal.parse(goal) if isinstance(goal, str) else goal
+    return _solve(
+        goal, "winrate", risk_percent, rr_ratios, thresholds, num_trades, initial_balance, method, num_paths, seed, tolerance, (tolerance, 1.0)
+    )
+
+
+def max_risk_calculator(
+    goal,
+    rr_ratios,
+    thresholds=(None,),
+    winrate=0.5,
+    num_trades=100,
+    initial_balance=50000,
+    method="exact",
+    num_paths=20000,
+    seed=None,
+    tolerance=1e-3,
+    max_risk=99.0,
+):
+    # Largest risk percent (up to max_risk) that meets goal for every (rr, threshold) pair,
+    # see min_winrate_calculator. Assumes the goal gets harder with more risk, as drawdown
+    # goals do; value is nan where even the smallest risk fails
+    goal = Goal.parse(goal) if isinstance(goal, str) else goal
+    return _solve(
+        goal, "risk", winrate, rr_ratios, thresholds, num_trades, initial_balance, method, num_paths, seed, tolerance, (tolerance, max_risk)
+    )
@@ -0,0 +1,190 @@
+import logging
+
+import numpy as np
+
+from .probability_sim import SimulationInputError, SimulationParams
+from .rng_streams import as_streams
+from .vector_sim import CHUNK_PATHS, TRADE_BLOCK, replay_outcomes, simulate_paths
+
+# bytes of balances read at a time, percentiles/drawdowns of files bigger than RAM
+# are computed slice by slice within this
+READ_BUDGET = 64 * 2**20
+
+
+def write_paths(
+    filename,
+    initial_balance,
+    winrate,
+    risk_percent,
+    rr_ratio,
+    num_trades,
+    num_paths,
+    consecutive_L_treshold=None,
+    seed=None,
+    dtype=np.float64,
+    sizing=None,
+):
+    """Simulate num_paths equity curves straight into a memory-mapped .npy file.
+
+    The file holds a (num_trades + 1, num_paths) float64 matrix, one row per
+    trade, so the balances of one trade across all paths are contiguous on disk
+    and percentiles/drawdowns read it front to back. Only one chunk of paths is
+    in memory at a time, the file can be far bigger than RAM. Row i of
+    open_paths(filename).T is path i of simulate_paths with the same seed.
+    dtype=np.float32 halves the file; the stats are still exact float64.
+    sizing is an optional PositionSizing strategy. Returns (store, stats) with store opened read-only.
+    """
+    num_paths = int(num_paths)
+    num_trades = int(num_trades)
+    if num_paths <= 0 or num_trades <= 0:
+        raise SimulationInputError("Error: All inputs must be positive numbers.")
+
+    store = np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=(num_trades + 1, num_paths))
+    logging.info(f"Writing {num_paths} paths of {num_trades} trades to {filename} ({store.nbytes / 2**30:.2f} GB)")
+    try:
+        # the transposed view has the (paths, trades) shape simulate_paths writes
+        _, stats = simulate_paths(
+            initial_balance, winrate, risk_percent, rr_ratio, num_trades, num_paths, consecutive_L_treshold, seed, out=store.T, sizing=sizing
+        )
+        store.flush()
+    finally:
+        del store
+    return open_paths(filename), stats
+
+
+def open_paths(filename):
+    # read-only (num_trades + 1, num_paths) memmap, nothing is loaded until sliced
+    return np.load(filename, mmap_mode="r")
+
+
+def _block_rows(store):
+    # trade rows per slice that fit READ_BUDGET
+    return max(1, READ_BUDGET // (store.shape[1] * store.itemsize))
+
+
+def percentile_bands(store, percentiles=(5, 25, 50, 75, 95)):
+    # (len(percentiles), num_trades + 1): the balance percentiles across paths at every trade
+    bands = np.empty((len(percentiles), store.shape[0]))
+    rows = _block_rows(store)
+    for start in range(0, store.shape[0], rows):
+        bands[:, start : start + rows] = np.percentile(store[start : start + rows], percentiles, axis=1)
+    return bands
+
+
+def max_drawdowns(store):
+    # Max drawdown (%) of every path, the same values as simulate_paths' stats
+    # (for a float32 store, the drawdowns of the rounded balances)
+    peak_balance = np.array(store[0], dtype=np.float64)
+    max_drawdown = np.zeros(store.shape[1])
+    drawdown = np.empty(store.shape[1])
+    rows = _block_rows(store)
+    for start in range(1, store.shape[0], rows):
+        for balance in np.asarray(store[start : start + rows]):
+            np.maximum(peak_balance, balance, out=peak_balance)
+            np.subtract(peak_balance, balance, out=drawdown)
+            drawdown /= peak_balance
+            np.maximum(max_drawdown, drawdown, out=max_drawdown)
+    return max_drawdown * 100
+
+
+def sample_paths(store, max_paths=50, max_points=2000):
+    # (trades, balances) of the first max_paths paths at up to max_points trades,
+    # a strided view of the file, only the sampled rows are read
+    step = max(1, -(-store.shape[0] // max_points))
+    trades = np.arange(0, store.shape[0], step)
+    return trades, store[::step, :max_paths]
+
+
+def plot_paths(ax, store, max_paths=10, max_points=2000, percentiles=(5, 25, 50, 75, 95)):
+    # Draw a fan chart of a stored ensemble on a matplotlib axis: percentile bands over
+    # every path and a few sample paths, downsampled (see fan_chart.plot_fan)
+    from .fan_chart import plot_fan
+
+    trades, balances = sample_paths(store, max_paths, max_points)
+    bands = percentile_bands(store, percentiles)
+    plot_fan(ax, bands, percentiles, samples=np.asarray(balances).T, sample_trades=trades)
+    return bands
+
+
+class PackedOutcomes:
+    """An ensemble stored as one bit per trade (win/loss) instead of its balances.
+
+    With fixed-fraction risk the balances follow from the outcomes and the
+    parameters (the reducer included), so 1M paths x 1k trades take 125 MB
+    instead of 8 GB. balances() rebuilds any range of paths on demand,
+    bit-identical to simulate_paths with the same seed.
+    """
+
+    def __init__(self, params, packed):
+        self.params = params
+        self.packed = packed  # (num_paths, ceil(num_trades / 8)) uint8, np.packbits along the trades
+        self.num_paths = packed.shape[0]
+
+    @classmethod
+    def simulate(cls, initial_balance, winrate, risk_percent, rr_ratio, num_trades, num_paths, consecutive_L_treshold=None, seed=None):
+        params = SimulationParams.from_inputs(initial_balance, winrate, risk_percent, rr_ratio, consecutive_L_treshold, num_trades)
+        num_paths = int(num_paths)
+        if num_paths <= 0:
+            raise SimulationInputError("Error: All inputs must be positive numbers.")
+        num_trades = params.num_trades
+        streams = as_streams(seed)
+        packed = np.empty((num_paths, -(-num_trades // 8)), dtype=np.uint8)
+        # TRADE_BLOCK is a multiple of 8, so every block fills whole bytes
+        for start in range(0, num_paths, CHUNK_PATHS):
+            stop = min(start + CHUNK_PATHS, num_paths)
+            trade = 0
+            for uniforms in streams.uniform_blocks(start, stop, num_trades, TRADE_BLOCK):
+                block_bytes = -(-uniforms.shape[1] // 8)
+                packed[start:stop, trade // 8 : trade // 8 + block_bytes] = np.packbits(uniforms <= params.winrate, axis=1)
+                trade += uniforms.shape[1]
+        return cls(params, packed)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def outcomes(self, path_start=0, path_stop=None):
+        # (paths, num_trades) bool, True for a win
+        return np.unpackbits(self.packed[path_start:path_stop], axis=1, count=self.params.num_trades).view(bool)
+
+    def _replay(self, path_start, path_stop, keep_paths, dtype=np.float64):
+        params = self.params
+        return replay_outcomes(
+            self.outcomes(path_start, path_stop),
+            params.initial_balance,
+            params.risk_percent,
+            params.rr_ratio,
+            params.threshold_input,
+            keep_paths=keep_paths,
+            dtype=dtype,
+        )
+
+    def balances(self, path_start=0, path_stop=None, dtype=np.float64):
+        # (paths, num_trades + 1) balances of paths path_start..path_stop
+        return self._replay(path_start, path_stop, True, dtype)[0]
+
+    def stats(self):
+        # per-path stats of the whole ensemble, replayed a chunk of paths at a time
+        stats = {}
+        for start in range(0, self.num_paths, CHUNK_PATHS):
+            stop = min(start + CHUNK_PATHS, self.num_paths)
+            for name, values in self._replay(start, stop, False)[1].items():
+                stats.setdefault(name, np.empty(self.num_paths, dtype=values.dtype))[start:stop] = values
+        return stats
+
+    def save(self, filename):
+        params = self.params
+        # -1 stands for the reducer being off
+        threshold = -1 if params.consecutive_L_treshold is None else params.consecutive_L_treshold
+        np.savez(
+            filename,
+            outcomes=self.packed,
+            params=np.array([params.initial_balance, params.winrate, params.risk_percent, params.rr_ratio, threshold, params.num_trades]),
+        )
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            initial_balance, winrate, risk_percent, rr_ratio, threshold, num_trades = data["params"].tolist()
+            params = SimulationParams(initial_balance, winrate, risk_percent, rr_ratio, None if threshold < 0 else int(threshold), int(num_trades))
+            return cls(params, data["outcomes"])
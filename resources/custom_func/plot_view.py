@@ -0,0 +1,156 @@
+# One Figure and canvas for the whole life of the GUI: the axes are styled once and
+# every run only swaps the line data, instead of rebuilding the figure per click
+import logging
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from .fan_chart import ensemble_bands, plot_fan
+from .metrics import phase
+
+
+def style_axes(ax):
+    ax.set_title("Simulation Results", color="grey", fontsize=20, loc="center", pad=15)
+    ax.grid(color="#161616", linestyle="--", linewidth=0.5, axis="both")
+
+    # Remove right and top spines
+    ax.spines["right"].set_visible(False)
+    ax.spines["top"].set_visible(False)
+
+    # Change x and y ticks style
+    ax.tick_params(axis="x", direction="inout", length=6, width=2)
+    ax.tick_params(axis="y", direction="inout", length=6, width=2)
+
+    # Change x and y label line width and color
+    ax.spines["bottom"].set_linewidth(2)
+    ax.spines["left"].set_linewidth(2)
+    ax.spines["bottom"].set_color("grey")
+    ax.spines["left"].set_color("grey")
+
+    # Change x and y ticks color
+    ax.tick_params(axis="x", colors="grey")
+    ax.tick_params(axis="y", colors="grey")
+
+    # Add a watermark
+    ax.text(
+        0.5,
+        0.5,  # X and Y position (relative, in axes coordinates)
+        "@MR_5OBOT",  # Watermark text
+        fontsize=30,  # Font size
+        color="gray",  # Text color
+        alpha=0.12,  # Transparency (0.0 to 1.0)
+        ha="center",  # Horizontal alignment
+        va="center",  # Vertical alignment
+        rotation=10,  # Rotate text
+        transform=ax.transAxes,  # Transform relative to the axes (0 to 1 range)
+    )
+
+
+class PlotView:
+    """A persistent balance plot packed into a Tk frame.
+
+    update() swaps the data of the existing line and drawdown marker. When
+    the new data fits the current axis limits only those artists are redrawn
+    over the cached background (blitting); otherwise the limits are
+    recomputed and the figure redrawn once. update_fan() shows an ensemble as
+    a downsampled fan chart instead. No Figure, axes or canvas is created
+    after __init__.
+    """
+
+    def __init__(self, master, style=style_axes, figsize=(9, 6)):
+        with phase("figure"):
+            plt.style.use("dark_background")
+            self.figure = Figure(figsize=figsize)
+            self.ax = self.figure.add_subplot()
+            style(self.ax)
+            # animated artists are left out of full draws and drawn on top of the background
+            (self.line,) = self.ax.plot([], [], label="balance_history", animated=True)
+            self.marker = self.ax.scatter([], [], color="red", label="Max Drawdown Point", zorder=10, animated=True)
+            self.artists = [self.line, self.marker]
+
+            self.canvas = FigureCanvasTkAgg(self.figure, master=master)  # A tk.DrawingArea.
+            self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self._background = None
+        # every full draw (first show, resize, new limits) refreshes the background
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.has_data = False
+        self._saving = False
+        self._fan = []
+
+    def _on_draw(self, event):
+        if self._saving:
+            return
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+
+    def _fits(self, x, y):
+        # the data lies inside the current view and fills at least half of it
+        (x0, x1), (y0, y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        low, high = float(np.min(y)), float(np.max(y))
+        return x0 <= 0 and x[-1] <= x1 and y0 <= low and high <= y1 and (high - low) >= (y1 - y0) / 2 and x[-1] >= x1 / 2
+
+    def update(self, balance_history, mark=None):
+        # mark: optional (trade, balance) point, e.g. the max drawdown trough
+        with phase("draw"):
+            self._update(balance_history, mark)
+
+    def _update(self, balance_history, mark):
+        y = np.asarray(balance_history, dtype=np.float64)
+        x = np.arange(len(y))
+        self.line.set_data(x, y)
+        self.marker.set_offsets(np.empty((0, 2)) if mark is None else [mark])
+        self.has_data = True
+
+        if self._fan:
+            self._clear_fan()
+        elif self._background is not None and self._fits(x, y):
+            self.canvas.restore_region(self._background)
+            for artist in self.artists:
+                self.ax.draw_artist(artist)
+            self.canvas.blit(self.figure.bbox)
+            logging.info("Updated the plot (blit)")
+            return
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw()
+        logging.info("Plotting the graph to the canvas")
+
+    def _clear_fan(self):
+        for artist in self._fan:
+            artist.remove()
+        self._fan = []
+
+    def update_fan(self, balances, num_samples=5):
+        # (paths, trades + 1) balances as percentile bands and a few sample paths; the
+        # fan's few artists replace the previous ones, the figure itself is kept
+        with phase("draw"):
+            self._update_fan(balances, num_samples)
+
+    def _update_fan(self, balances, num_samples):
+        self._clear_fan()
+        self.line.set_data([], [])
+        self.marker.set_offsets(np.empty((0, 2)))
+        bands = ensemble_bands(balances)
+        self._fan = plot_fan(self.ax, bands, samples=balances[:num_samples])
+        self.has_data = True
+        # relim only measures lines, the filled bands are added by hand
+        self.ax.relim()
+        self.ax.update_datalim([(0, bands.min()), (bands.shape[1] - 1, bands.max())])
+        self.ax.autoscale_view()
+        self.canvas.draw()
+        logging.info("Plotting the fan chart to the canvas")
+
+    def save(self, filename):
+        # savefig skips animated artists, so they are made regular for the save
+        self._saving = True
+        for artist in self.artists:
+            artist.set_animated(False)
+        try:
+            self.figure.savefig(filename)
+        finally:
+            for artist in self.artists:
+                artist.set_animated(True)
+            self._saving = False
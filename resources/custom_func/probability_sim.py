@@ -0,0 +1,179 @@
+# Computational core of the simulator: no GUI or plotting imports, errors are
+# raised instead of shown, so it can run headless and imports in milliseconds.
+# numpy (random streams, drawdown) is only imported on the first simulation
+from array import array
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .metrics import count, phase
+
+# trades between two progress reports of simulate_trading
+PROGRESS_EVERY = 4096
+
+
+class SimulationInputError(ValueError):
+    pass
+
+
+def parse_threshold(consecutive_L_treshold):
+    # Empty/zero input or a value that isn't an integer leaves the risk reducer off
+    if not consecutive_L_treshold:
+        return None
+    try:
+        return int(consecutive_L_treshold)
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class SimulationParams:
+    initial_balance: float
+    winrate: float
+    risk_percent: float
+    rr_ratio: float
+    consecutive_L_treshold: Optional[int]  # None = risk reducer off
+    num_trades: int
+
+    def __post_init__(self):
+        if self.initial_balance <= 0 or self.risk_percent <= 0 or self.rr_ratio <= 0 or self.num_trades <= 0 or self.winrate <= 0:
+            raise SimulationInputError("Error: All inputs must be positive numbers.")
+
+    @classmethod
+    def from_inputs(cls, balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry):
+        # Build from raw user input (strings from the GUI entries, CLI values, ...)
+        try:
+            with phase("parse"):
+                return cls(
+                    initial_balance=float(balanceEntry),
+                    winrate=float(winrateEntry),
+                    risk_percent=float(riskEntry),
+                    rr_ratio=float(rrEntry),
+                    consecutive_L_treshold=parse_threshold(consecutive_LossesEntry),
+                    num_trades=int(nTrades_entry),
+                )
+        except SimulationInputError:
+            raise
+        except (TypeError, ValueError):
+            raise SimulationInputError("Error: Please enter valid numbers.") from None
+
+    @property
+    def threshold_input(self):
+        # The threshold as from_inputs reads it back: a plain 0 would turn the reducer
+        # off, "0" keeps it on (half risk after every trade), like the GUI entry
+        return None if self.consecutive_L_treshold is None else str(self.consecutive_L_treshold)
+
+
+@dataclass
+class SimulationResult:
+    final_balance: float
+    total_return: float
+    max_drawdown: float
+    max_consecutive_losses: int
+    wins: int
+    losses: int
+    avg_win: float
+    avg_loss: float
+    expected_value: float
+    balance_history: array = field(repr=False)  # array('d'), 8 bytes a balance instead of a boxed float
+
+    def summary(self):
+        return (
+            f"Final Balance: ${self.final_balance:.2f}\n"
+            f"Total Return: {self.total_return:.2f}%\n"
+            f"Max Drawdown: {self.max_drawdown:.2f}%\n"
+            f"Consecutive Losses: {self.max_consecutive_losses:.0f}\n"
+            f"Average Win: ${self.avg_win:.2f}\n"
+            f"Average Loss: ${self.avg_loss:.2f}\n"
+            f"Expected Value: ${self.expected_value:.2f}"
+        )
+
+
+def simulate_trading(params, seed=None, path=0, progress=None):
+    """Simulate one equity path for params, the reference scalar engine.
+
+    seed is an int or a RandomStreams; the result is path number `path` of
+    those streams, so it matches the same row of simulate_paths with the same
+    seed. progress, if given, is called as progress(trades_done, num_trades)
+    every PROGRESS_EVERY trades, e.g. to update a progress bar or to cancel
+    the run by raising. Returns a SimulationResult.
+    """
+    import numpy as np
+
+    from .drawdown import underwater_curve
+    from .rng_streams import as_streams
+
+    initial_balance = params.initial_balance
+    winrate = params.winrate
+    rr_ratio = params.rr_ratio
+    num_trades = params.num_trades
+    # Everything the loop needs is validated and precomputed here, the loop itself only
+    # does float arithmetic on locals. balance * half_risk is bit for bit balance * risk / 2
+    risk = params.risk_percent / 100
+    half_risk = risk / 2
+    threshold = params.consecutive_L_treshold
+    if threshold is None:
+        threshold = num_trades + 1  # never reached, the risk reducer stays off
+
+    balance_history = array("d", [initial_balance])
+    record = balance_history.append
+    balance = initial_balance
+    consecutive_losses = 0
+    max_consecutive_losses = 0
+    wins_profits = 0.0
+    losses_profits = 0.0
+    wins = 0
+    reduced_risk_active = False  # half risk once the losing streak reaches the threshold
+    trades_done = 0
+
+    # same draws as that row of simulate_paths, a block of PROGRESS_EVERY trades at a time
+    with phase("trade_loop"):
+        for draws in as_streams(seed).path_blocks(path, num_trades, PROGRESS_EVERY):
+            if progress is not None:
+                progress(trades_done, num_trades)
+            trades_done += len(draws)
+            for draw in draws:
+                risk_amount = balance * (half_risk if reduced_risk_active else risk)
+                if draw <= winrate:
+                    profit = risk_amount * rr_ratio
+                    balance += profit
+                    wins += 1
+                    wins_profits += profit
+                    consecutive_losses = 0
+                else:
+                    balance -= risk_amount
+                    losses_profits += risk_amount
+                    consecutive_losses += 1
+                    if consecutive_losses > max_consecutive_losses:
+                        max_consecutive_losses = consecutive_losses
+                reduced_risk_active = consecutive_losses >= threshold
+                record(balance)
+
+    # Calculate Max Drawdown from Balance History: one running-maximum pass over the
+    # array's buffer instead of a Python scan
+    with phase("drawdown_scan"):
+        max_drawdown = float(underwater_curve(np.frombuffer(balance_history)).max())
+    count("runs")
+    count("trades", num_trades)
+
+    # Calculate total return
+    total_return = ((balance - initial_balance) / initial_balance) * 100
+
+    # Expected Value (EV) formula
+    losses = num_trades - wins
+    actual_winrate = wins / num_trades
+    avg_win = wins_profits / wins if wins > 0 else 0
+    avg_loss = losses_profits / losses if losses > 0 else 0
+    expected_value = (actual_winrate * avg_win) - ((1 - actual_winrate) * avg_loss)
+
+    return SimulationResult(
+        final_balance=balance,
+        total_return=total_return,
+        max_drawdown=max_drawdown,
+        max_consecutive_losses=max_consecutive_losses,
+        wins=wins,
+        losses=losses,
+        avg_win=avg_win,
+        avg_loss=avg_loss,
+        expected_value=expected_value,
+        balance_history=balance_history,
+    )
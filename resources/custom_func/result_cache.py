@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import os
+import pickle
+from collections import OrderedDict
+
+from .probability_sim import SimulationParams
+from .rng_streams import RandomStreams
+
+
+class ResultCache:
+    """LRU cache of simulation results, optionally backed by a directory on disk.
+
+    Results are keyed on the simulation parameters, the seed and the engine, so
+    an identical configuration is only ever computed once. Runs without a seed
+    are random and never cached. Cached values are shared, treat them as read-only.
+    """
+
+    def __init__(self, maxsize=32, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(engine, initial_balance, winrate, risk_percent, rr_ratio, consecutive_L_treshold, num_trades, seed, **options):
+        # Normalized so "50000" and 50000.0, or "" and None thresholds, share an entry.
+        # Raises SimulationInputError (a ValueError) for bad inputs, like the engines do
+        if seed is None:
+            return None
+        if isinstance(seed, RandomStreams):
+            seed = (seed.entropy, seed.spawn_key, seed.antithetic)
+        params = SimulationParams.from_inputs(initial_balance, winrate, risk_percent, rr_ratio, consecutive_L_treshold, num_trades)
+        return (engine, params, seed, tuple(sorted(options.items())))
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+
+    def get(self, key):
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), "rb") as f:
+                value = pickle.load(f)
+            self._remember(key, value)
+            return value
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.cache_dir:
+            with open(self._disk_path(key), "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _remember(self, key, value):
+        self._results[key] = value
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        # compute() is only called on a miss; a key of None (unseeded run) always computes
+        if key is not None:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                logging.debug("Simulation result served from cache")
+                return value
+        self.misses += 1
+        value = compute()
+        if key is not None and value is not None:
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._results.clear()
+
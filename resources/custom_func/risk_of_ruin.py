@@ -0,0 +1,162 @@
+import logging
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from .exact_dist import _shift_add
+from .probability_sim import SimulationInputError
+
+# drawdown buckets per full-risk loss: a full-risk loss moves exactly this many
+# buckets, wins and half-risk moves are split between neighbouring buckets
+BUCKETS_PER_LOSS = 32
+
+
+def streak_probabilities(winrate, num_trades, streaks):
+    """P(at least one losing streak of `streak` trades within num_trades), for every streak.
+
+    Losing streaks only depend on the win/loss sequence, not on the position
+    size, so the risk reducer doesn't change them. Uses the recurrence
+    P_n = P_{n-1} - q^k * (w * P_{n-k-1}) for the probability of no such
+    streak, with every streak length stepped together. Returns an array
+    shaped like streaks.
+    """
+    winrate = min(float(winrate), 1.0)
+    num_trades = int(num_trades)
+    streaks = np.asarray(streaks, dtype=np.int64)
+    if winrate <= 0 or num_trades <= 0 or np.any(streaks <= 0):
+        raise SimulationInputError("Error: All inputs must be positive numbers.")
+    lengths = streaks.ravel()
+    loss_run = (1 - winrate) ** lengths
+
+    # no_streak[n]: P(no streak of each length in the first n trades), one column per length
+    no_streak = np.ones((num_trades + 1, len(lengths)))
+    columns = np.arange(len(lengths))
+    for n in range(1, num_trades + 1):
+        before = n - lengths - 1
+        # the streak ends at trade n: it is preceded by a win (or starts at trade 1)
+        # after a prefix without one
+        start = np.where(before >= 0, winrate * no_streak[np.maximum(before, 0), columns], (before == -1).astype(float))
+        no_streak[n] = no_streak[n - 1] - loss_run * start
+    return (1 - no_streak[-1]).reshape(streaks.shape)
+
+
+def streak_probability(winrate, num_trades, streak):
+    # P(at least one losing streak of `streak` trades within num_trades)
+    return float(streak_probabilities(winrate, num_trades, [streak])[0])
+
+
+@dataclass
+class FirstPassage:
+    # When the drawdown from the running peak first reaches the barrier: hit_probabilities[t]
+    # is the probability that it happens on trade t + 1, the rest never hits within the horizon
+    hit_probabilities: np.ndarray
+    drawdown_percent: float
+
+    @property
+    def num_trades(self):
+        return len(self.hit_probabilities)
+
+    def prob_hit(self, trades=None):
+        # probability of reaching the barrier within `trades` trades (the whole horizon by default)
+        return float(self.hit_probabilities[: self.num_trades if trades is None else int(trades)].sum())
+
+    def hit_curve(self):
+        # probability of having reached the barrier by every trade
+        return np.cumsum(self.hit_probabilities)
+
+    def expected_trades_to_hit(self):
+        # mean trade number of the first hit among the paths that do hit within the horizon
+        prob = self.hit_probabilities.sum()
+        if prob <= 0:
+            return math.inf
+        return float(np.dot(np.arange(1, self.num_trades + 1), self.hit_probabilities) / prob)
+
+    def expected_trades_capped(self):
+        # E[min(first hit, num_trades)], the expected trades survived within the horizon
+        survival = 1 - self.hit_curve()
+        return float(1 + survival[:-1].sum())
+
+    def summary(self):
+        return (
+            f"P({self.drawdown_percent:g}% Drawdown within {self.num_trades} trades): {self.prob_hit() * 100:.2f}%\n"
+            f"Expected Trades to Hit (when it does): {self.expected_trades_to_hit():.1f}"
+        )
+
+
+def drawdown_first_passage(params, drawdown_percent, buckets_per_loss=BUCKETS_PER_LOSS):
+    """Probability of the drawdown from the running peak first reaching drawdown_percent on every trade.
+
+    Dynamic programming over (losing streak capped at the threshold, log
+    drawdown bucket), one trade at a time, so the risk reducer is followed
+    exactly like in simulate_trading. Mass that reaches the barrier is absorbed
+    and recorded, a win past the peak resets the drawdown to zero. Without the
+    reducer full-risk losses move whole buckets; wins and half-risk moves are
+    split between neighbouring buckets. Returns a FirstPassage.
+    """
+    winrate = min(params.winrate, 1.0)
+    risk = params.risk_percent / 100
+    rr_ratio = params.rr_ratio
+    num_trades = params.num_trades
+    threshold = params.consecutive_L_treshold
+    if not 0 < drawdown_percent < 100:
+        raise SimulationInputError("Error: The drawdown must be between 0 and 100%.")
+
+    passage = FirstPassage(np.zeros(num_trades), float(drawdown_percent))
+    if risk >= 1:
+        # the first loss takes the whole balance
+        passage.hit_probabilities[:] = winrate ** np.arange(num_trades) * (1 - winrate)
+        return passage
+    if threshold is not None and threshold >= num_trades:
+        threshold = None
+
+    # moves of log(peak / balance): a loss deepens the drawdown, a win reduces it
+    width = -math.log1p(-risk) / buckets_per_loss
+    win_full, win_half = -math.log1p(risk * rr_ratio) / width, -math.log1p(risk * rr_ratio / 2) / width
+    loss_full, loss_half = float(buckets_per_loss), -math.log1p(-risk / 2) / width
+    # buckets 0..alive - 1 are below the barrier, the extra last one collects the hits
+    alive = max(1, math.ceil(-math.log1p(-drawdown_percent / 100) / width - 1e-9))
+    if num_trades * buckets_per_loss < alive:
+        # even num_trades full-risk losses in a row stay above the barrier
+        return passage
+
+    # mass[s, b]: probability of a losing streak of s (s == threshold: at least threshold,
+    # the next trade is at half risk) and a drawdown in bucket b, without having hit
+    states = 1 if threshold is None else threshold + 1
+    mass = np.zeros((states, alive + 1))
+    start = np.zeros((1, alive + 1))
+    start[0, 0] = 1.0
+    # the first trade is always at full risk, it starts the chain from streak 0
+    lost = 0 if threshold is None else min(1, threshold)
+    _shift_add(mass[:1], winrate * start, win_full)
+    _shift_add(mass[lost : lost + 1], (1 - winrate) * start, loss_full)
+    new_mass = np.zeros_like(mass)
+
+    for trade in range(num_trades):
+        if trade:
+            new_mass.fill(0.0)
+            if threshold is None:
+                _shift_add(new_mass, winrate * mass, win_full)
+                _shift_add(new_mass, (1 - winrate) * mass, loss_full)
+            else:
+                full, half = mass[:threshold], mass[threshold:]
+                _shift_add(new_mass[:1], winrate * full.sum(axis=0, keepdims=True), win_full)
+                _shift_add(new_mass[:1], winrate * half, win_half)
+                _shift_add(new_mass[1:], (1 - winrate) * full, loss_full)
+                _shift_add(new_mass[threshold:], (1 - winrate) * half, loss_half)
+            mass, new_mass = new_mass, mass
+        passage.hit_probabilities[trade] = mass[:, -1].sum()
+        mass[:, -1] = 0.0
+        if mass.sum() < 1e-15:
+            # every path has hit, the later trades stay at zero
+            break
+
+    logging.debug(f"Drawdown DP over {num_trades} trades, {states} streak states, {alive} buckets")
+    return passage
+
+
+def risk_of_ruin(params, ruin_percent=50, buckets_per_loss=BUCKETS_PER_LOSS):
+    # probability of a ruin_percent drawdown from the peak within the horizon, and the
+    # expected trade it happens on when it does (see drawdown_first_passage)
+    passage = drawdown_first_passage(params, ruin_percent, buckets_per_loss)
+    return passage.prob_hit(), passage.expected_trades_to_hit()
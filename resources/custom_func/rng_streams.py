@@ -0,0 +1,118 @@
+import numpy as np
+
+# paths that share one PCG64 stream, one after the other. Each block of paths gets
+# its own child of the seed, so any range of paths can be drawn without the rest
+PATHS_PER_STREAM = 256
+# most numbers uniform_blocks draws at once, a few blocks of a chunk of paths
+REFILL_DRAWS = 1 << 23
+
+
+class RandomStreams:
+    """Reproducible uniform draws for every (path, trade) of a simulation.
+
+    The draw for a given path and trade depends only on the seed, never on how
+    the paths are split into chunks, workers or blocks of trades, so the same
+    seed gives bit-identical results in every engine. seed may be an int, None
+    (fresh entropy, see .entropy to replay the run) or a SeedSequence.
+    With antithetic=True the paths come in pairs: path 2k + 1 gets 1 - u for
+    every draw u of path 2k, so a lucky path is balanced by an unlucky one.
+    """
+
+    def __init__(self, seed=None, antithetic=False):
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.entropy = seed_sequence.entropy
+        self.spawn_key = tuple(seed_sequence.spawn_key)
+        self.antithetic = bool(antithetic)
+
+    def __repr__(self):
+        return f"RandomStreams(entropy={self.entropy}, spawn_key={self.spawn_key}, antithetic={self.antithetic})"
+
+    def child(self, key):
+        # independent streams for sub-simulations, e.g. the cells of a sweep
+        return RandomStreams(np.random.SeedSequence(self.entropy, spawn_key=self.spawn_key + (int(key),)), self.antithetic)
+
+    def with_antithetic(self, antithetic=True):
+        # the same streams with antithetic pairing switched on (or off)
+        return RandomStreams(np.random.SeedSequence(self.entropy, spawn_key=self.spawn_key), antithetic)
+
+    def _seed_sequence(self, block):
+        return np.random.SeedSequence(self.entropy, spawn_key=self.spawn_key + (block,))
+
+    def _generator(self, path, num_trades, seed_sequence=None):
+        # generator positioned at the first draw of path; seed_sequence: the one of its
+        # stream when the caller already has it
+        block, row = divmod(path, PATHS_PER_STREAM)
+        bit_generator = np.random.PCG64(seed_sequence or self._seed_sequence(block))
+        bit_generator.advance(row * num_trades)
+        return np.random.Generator(bit_generator)
+
+    def _generators(self, path_start, path_stop, num_trades):
+        # a generator per path, the seed sequence of every stream built once
+        sequences = {}
+        generators = []
+        for path in range(path_start, path_stop):
+            block = path // PATHS_PER_STREAM
+            if block not in sequences:
+                sequences[block] = self._seed_sequence(block)
+            generators.append(self._generator(path, num_trades, sequences[block]))
+        return generators
+
+    def uniforms(self, path_start, path_stop, num_trades):
+        # (path_stop - path_start, num_trades) draws, one row per path
+        if self.antithetic:
+            # draw the first path of every pair once, the second is its mirror
+            pairs = self.with_antithetic(False).uniforms(path_start // 2, (path_stop + 1) // 2, num_trades)
+            out = np.repeat(pairs, 2, axis=0)[path_start % 2 : path_start % 2 + path_stop - path_start]
+            np.subtract(1.0, out[1 - path_start % 2 :: 2], out=out[1 - path_start % 2 :: 2])
+            return out
+        out = np.empty((path_stop - path_start, num_trades))
+        path = path_start
+        while path < path_stop:
+            rows = min(path_stop - path, PATHS_PER_STREAM - path % PATHS_PER_STREAM)
+            self._generator(path, num_trades).random(out=out[path - path_start : path - path_start + rows])
+            path += rows
+        return out
+
+    def uniform_blocks(self, path_start, path_stop, num_trades, block_trades):
+        # Same draws as uniforms(), yielded block_trades trades at a time so long
+        # horizons never hold more than (paths, block_trades) numbers, or REFILL_DRAWS:
+        # every path keeps its generator from block to block and is drawn a refill of
+        # several blocks at a time, so the loop over the paths runs once per refill
+        if block_trades >= num_trades:
+            yield self.uniforms(path_start, path_stop, num_trades)
+            return
+        if self.antithetic:
+            # draw the first path of every pair once, the second is its mirror
+            first = path_start % 2
+            for pairs in self.with_antithetic(False).uniform_blocks(path_start // 2, (path_stop + 1) // 2, num_trades, block_trades):
+                out = np.repeat(pairs, 2, axis=0)[first : first + path_stop - path_start]
+                np.subtract(1.0, out[1 - first :: 2], out=out[1 - first :: 2])
+                yield out
+            return
+        num_paths = path_stop - path_start
+        fills = [generator.random for generator in self._generators(path_start, path_stop, num_trades)]
+        refill_trades = max(1, REFILL_DRAWS // (num_paths * block_trades)) * block_trades
+        for refill_start in range(0, num_trades, refill_trades):
+            refill = np.empty((num_paths, min(refill_trades, num_trades - refill_start)))
+            for row, fill in zip(refill, fills):
+                fill(out=row)
+            for trade_start in range(0, refill.shape[1], block_trades):
+                yield refill[:, trade_start : trade_start + block_trades]
+
+    def path_blocks(self, path, num_trades, block_trades=65536):
+        # the draws of one path as lists of Python floats, block_trades at a time
+        mirrored = self.antithetic and path % 2
+        generator = self._generator(path // 2 if self.antithetic else path, num_trades)
+        for trade_start in range(0, num_trades, block_trades):
+            draws = generator.random(min(block_trades, num_trades - trade_start))
+            yield (1.0 - draws if mirrored else draws).tolist()
+
+    def iter_path(self, path, num_trades, block_trades=65536):
+        # the draws of one path as Python floats, for the scalar engines
+        for block in self.path_blocks(path, num_trades, block_trades):
+            yield from block
+
+
+def as_streams(seed):
+    # engines accept either a seed or an existing RandomStreams
+    return seed if isinstance(seed, RandomStreams) else RandomStreams(seed)
@@ -1,142 +1,125 @@
 import logging
-import random
 from tkinter import messagebox
 
+from .metrics import count, phase
+from .probability_sim import SimulationInputError, SimulationParams, simulate_trading
 
-def probability_simulator(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry, result_label):
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
-    logging.info("Starting simulation")
 
+def read_params(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry, result_label):
+    # SimulationParams from the entries, or None after showing the input error
     try:
         # Get user inputs
-        initial_balance = float(balanceEntry.get())
-        winrate = float(winrateEntry.get())
-        risk_percent = float(riskEntry.get())
-        rr_ratio = float(rrEntry.get())
-        consecutive_L_treshold = consecutive_LossesEntry.get().strip()  # .strip() to remove extra spaces
-        num_trades = int(nTrades_entry.get())
-
-        # Validate inputs
-        if initial_balance <= 0 or risk_percent <= 0 or rr_ratio <= 0 or num_trades <= 0 or winrate <= 0:
-            # result_label.configure(text="Error: All inputs must be positive numbers.")
-            messagebox.showerror(message="Error: All inputs must be positive numbers.")
-            # debuging
-            logging.error("Error: All inputs must be positive numbers.")
-            return
-
-        # Initialize balance history
-        global balance_history
-        balance_history = [initial_balance]
-
-        # Initialize variables
-        balance = initial_balance
-        consecutive_losses = 0
-        max_consecutive_losses = 0
-        wins = 0
-        losses = 0
-        avg_win = 0
-        avg_loss = 0
-        wins_profits = 0
-        losses_profits = 0
-
-        reduced_risk_active = False  # Track if risk reduction is active
-
-        for trade in range(num_trades):
-            if reduced_risk_active:
-                risk_amount = balance * (risk_percent / 100) / 2
-            else:
-                risk_amount = balance * (risk_percent / 100)
-
-            # Simulate trade outcome
-            if random.random() <= winrate:
-                profit = risk_amount * rr_ratio
-                balance += profit
-                wins += 1
-                wins_profits += profit
-                consecutive_losses = 0
-                reduced_risk_active = False  # Reset risk reduction on a win
-                # debuging
-                # logging.info("wining trade")
-            else:
-                loss = risk_amount
-                balance -= loss
-                losses += 1
-                losses_profits += loss
-                consecutive_losses += 1
-                max_consecutive_losses = max(max_consecutive_losses, consecutive_losses)
-                # debuging
-                # logging.info("lossing trade")
-
-            # Check for consecutive losses threshold
-            if consecutive_L_treshold:  # Only reduce risk if the input is not empty
-                try:
-                    threshold = int(consecutive_L_treshold)
-                    if consecutive_losses >= threshold:
-                        reduced_risk_active = True  # Activate risk reduction
-                except ValueError:
-                    pass  # If conversion fails, don't adjust risk
-
-            # Append the current balance to history
-            balance_history.append(balance)
-            if not balance_history:
-                logging.info("Error: Simulation failed. No balance data to plot.")
-                return
-
-        # Calculate Max Drawdown from Balance History
-        max_drawdown = 0
-        peak_balance = balance_history[0]
-
-        for bal in balance_history:
-            if bal > peak_balance:
-                peak_balance = bal
-            drawdown = (peak_balance - bal) / peak_balance
-            max_drawdown = max(max_drawdown, drawdown)
-        max_drawdown *= 100  # Convert to percentage
-
-        # Calculate total return
-        total_return = ((balance - initial_balance) / initial_balance) * 100
-
-        # Expected Value (EV) formula
-        actual_winrate = wins / num_trades if wins > 0 else 0
-        # Calculate average win and loss
-        if wins + losses == num_trades:
-            avg_win = wins_profits / wins if wins > 0 else 0
-            avg_loss = losses_profits / losses if losses > 0 else 0
-
-        expected_value = (actual_winrate * avg_win) - ((1 - actual_winrate) * avg_loss)
-
-        # Display results in a messagebox
-        messagebox.showinfo(
-            message=(
-                f"Final Balance: ${balance:.2f}\n"
-                f"Total Return: {total_return:.2f}%\n"
-                f"Max Drawdown: {max_drawdown:.2f}%\n"
-                f"Consecutive Losses: {max_consecutive_losses:.0f}\n"
-                f"Average Win: ${avg_win:.2f}\n"
-                f"Average Loss: {avg_loss:.2f}\n"
-                f"Expected Value: ${expected_value:.2f}"
-            )
-        )
-        result_label.configure(
-            text=(
-                f"Final Balance: ${balance:.2f}\n"
-                f"Total Return: {total_return:.2f}%\n"
-                f"Max Drawdown: {max_drawdown:.2f}%\n"
-                f"Consecutive Losses: {max_consecutive_losses:.0f}\n"
-                f"Average Win: ${avg_win:.2f}\n"
-                f"Average Loss: {avg_loss:.2f}\n"
-                f"Expected Value: ${expected_value:.2f}"
-            )
+        return SimulationParams.from_inputs(
+            balanceEntry.get(),
+            winrateEntry.get(),
+            riskEntry.get(),
+            rrEntry.get(),
+            consecutive_LossesEntry.get().strip(),  # .strip() to remove extra spaces
+            nTrades_entry.get(),
         )
+    except SimulationInputError as error:
+        messagebox.showerror(message=str(error))
+        result_label.configure(text=str(error))
+        # debuging
+        logging.error(str(error))
+        return None
 
-        return balance_history
 
-    except ValueError:
-        messagebox.showerror(message="Error: Please enter valid numbers.")
-        result_label.configure(text="Error: Please enter valid numbers.")
+def show_result(result, result_label):
+    # Keep the path for get_balance_history() and display the results, on the main thread
+    global balance_history
+    balance_history = result.balance_history
+
+    # Display results in a messagebox
+    messagebox.showinfo(message=result.summary())
+    result_label.configure(text=result.summary())
 
     # debuging
-    logging.info("simulation ended.")
+    with phase("logging"):
+        logging.info("simulation ended.")
+    return balance_history
+
+
+def read_num_paths(pathsEntry):
+    # paths to simulate, 1 (a single path) when the entry is empty or not a number
+    try:
+        return max(1, int(pathsEntry.get()))
+    except ValueError:
+        return 1
+
+
+def iter_ensemble(params, num_paths, seed=None, chunk_paths=1024):
+    # Streams num_paths paths of the vector engine: yields (done, balances, stats) after
+    # every slice of chunk_paths paths. balances and stats are the full-size arrays,
+    # filled for the first `done` paths (which don't change afterwards)
+    import numpy as np
+
+    from .vector_sim import iter_paths
+
+    balances = np.empty((num_paths, params.num_trades + 1))
+    stats = {}
+    for start, chunk_balances, chunk_stats in iter_paths(
+        params.initial_balance,
+        params.winrate,
+        params.risk_percent,
+        params.rr_ratio,
+        params.num_trades,
+        num_paths,
+        params.threshold_input,
+        seed,
+        chunk_paths,
+    ):
+        stop = start + len(chunk_balances)
+        balances[start:stop] = chunk_balances
+        for name, values in chunk_stats.items():
+            stats.setdefault(name, np.empty(num_paths, dtype=values.dtype))[start:stop] = values
+        yield stop, balances, stats
+
+
+def simulate_ensemble(params, num_paths, seed=None, progress=None, publish=None, chunk_paths=1024):
+    # (balances, stats) of num_paths paths, run a slice at a time so progress(done,
+    # num_paths) can be reported (and the run cancelled); publish((done, balances)) hands
+    # every slice to a live plot
+    balances, stats = None, None
+    with phase("ensemble"):
+        for done, balances, stats in iter_ensemble(params, num_paths, seed, chunk_paths):
+            if publish is not None:
+                publish((done, balances))
+            if progress is not None:
+                progress(done, num_paths)
+    count("paths", num_paths)
+    return balances, stats
+
+
+def show_ensemble(stats, initial_balance, result_label):
+    # Display the summary of a multi-path run
+    from .sweep import summarize_stats
+
+    summary = summarize_stats(stats, initial_balance)
+    text = (
+        f"Paths: {len(stats['final_balance'])}\n"
+        f"Median Final Balance: ${summary['median_final_balance']:.2f}\n"
+        f"5th-95th Percentile: ${summary['p5_final_balance']:.2f} - ${summary['p95_final_balance']:.2f}\n"
+        f"Probability of Profit: {summary['prob_profit'] * 100:.2f}%\n"
+        f"Median Max Drawdown: {summary['median_max_drawdown']:.2f}%\n"
+        f"95th Percentile Max Drawdown: {summary['p95_max_drawdown']:.2f}%"
+    )
+    result_label.configure(text=text)
+    with phase("logging"):
+        logging.info(text)
+        logging.info("simulation ended.")
+
+
+def probability_simulator(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry, result_label, seed=None):
+    with phase("logging"):
+        logging.info("Starting simulation")
+
+    params = read_params(balanceEntry, winrateEntry, riskEntry, rrEntry, consecutive_LossesEntry, nTrades_entry, result_label)
+    if params is None:
+        return
+
+    result = simulate_trading(params, seed=seed)
+    return show_result(result, result_label)
 
 
 def get_balance_history():
@@ -0,0 +1,159 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from .probability_sim import SimulationInputError
+
+# most risk levels a strategy may use, the level and the outcome share one uint8 code
+MAX_LEVELS = 64
+
+
+class PositionSizing:
+    """How much every trade risks, as a table the batch engine can index.
+
+    A strategy risks base_risk(params) (a fraction of the balance, or dollars
+    when proportional is False) times multipliers(params)[level]. The level
+    of the first trade is 0; after that, next_levels(loss_streaks,
+    win_streaks) gives, for a (trades, paths) block, the level of the trade
+    following each trade, computed from the streaks after it with array
+    operations over the whole block. It returns None when the level never
+    leaves 0. win_streaks is only computed for strategies that set
+    needs_win_streaks.
+    """
+
+    proportional = True
+    needs_win_streaks = False
+
+    def base_risk(self, params):
+        return params.risk_percent / 100
+
+    def multipliers(self, params):
+        return np.ones(1)
+
+    def next_levels(self, loss_streaks, win_streaks):
+        return None
+
+
+@dataclass(frozen=True)
+class FixedFraction(PositionSizing):
+    # risk_percent of the current balance on every trade
+    pass
+
+
+@dataclass(frozen=True)
+class FixedDollar(PositionSizing):
+    # the same dollar amount on every trade, whatever the balance (it can go negative)
+    amount: float
+    proportional = False
+
+    def __post_init__(self):
+        if self.amount <= 0:
+            raise SimulationInputError("Error: All inputs must be positive numbers.")
+
+    def base_risk(self, params):
+        return self.amount
+
+
+@dataclass(frozen=True)
+class Kelly(PositionSizing):
+    # fraction * the Kelly fraction winrate - (1 - winrate) / rr of the balance, capped
+    # at cap (a fraction of the balance) when given; risk_percent isn't used
+    fraction: float = 1.0
+    cap: Optional[float] = None
+
+    def __post_init__(self):
+        if self.fraction <= 0:
+            raise SimulationInputError("Error: All inputs must be positive numbers.")
+
+    def base_risk(self, params):
+        kelly = params.winrate - (1 - params.winrate) / params.rr_ratio
+        if kelly <= 0:
+            logging.warning(f"No edge at winrate {params.winrate} and rr {params.rr_ratio}, Kelly risks nothing")
+            return 0.0
+        risk = kelly * self.fraction
+        return risk if self.cap is None else min(risk, self.cap)
+
+
+@dataclass(frozen=True)
+class AntiMartingale(PositionSizing):
+    # risk multiplied by step after every consecutive win, up to max_steps times, and
+    # back to risk_percent after a loss
+    step: float = 2.0
+    max_steps: int = 3
+    needs_win_streaks = True
+
+    def __post_init__(self):
+        if self.step <= 0 or not 0 < self.max_steps < MAX_LEVELS:
+            raise SimulationInputError("Error: All inputs must be positive numbers.")
+
+    def multipliers(self, params):
+        return self.step ** np.arange(self.max_steps + 1, dtype=np.float64)
+
+    def next_levels(self, loss_streaks, win_streaks):
+        return np.minimum(win_streaks, self.max_steps).astype(np.uint8)
+
+
+@dataclass(frozen=True)
+class StreakScaling(PositionSizing):
+    # After at least n consecutive losses the risk is multiplied by scales[n] (the
+    # largest n reached applies), back to risk_percent after a win. {3: 0.5} is the
+    # classic risk reducer; a threshold of 0 scales every trade after the first
+    scales: dict = field(default_factory=lambda: {3: 0.5})
+
+    def __post_init__(self):
+        if not self.scales or len(self.scales) >= MAX_LEVELS:
+            raise SimulationInputError(f"Error: Give between 1 and {MAX_LEVELS - 1} streak scales.")
+        if min(self.scales) < 0 or min(self.scales.values()) < 0:
+            raise SimulationInputError("Error: All inputs must be positive numbers.")
+
+    def __hash__(self):
+        return hash(tuple(sorted(self.scales.items())))
+
+    def multipliers(self, params):
+        return np.array([1.0] + [self.scales[n] for n in sorted(self.scales)])
+
+    def next_levels(self, loss_streaks, win_streaks):
+        thresholds = sorted(self.scales)
+        levels = (loss_streaks >= thresholds[0]).view(np.uint8)
+        for threshold in thresholds[1:]:
+            levels = levels + (loss_streaks >= threshold).view(np.uint8)
+        return levels
+
+
+def default_sizing(params):
+    # what the engines do without a strategy: fixed fraction, halved from
+    # consecutive_L_treshold losses on
+    if params.consecutive_L_treshold is None:
+        return FixedFraction()
+    return StreakScaling({params.consecutive_L_treshold: 0.5})
+
+
+def parse_sizing(text):
+    """A strategy from a short spec, for the command line.
+
+    "fixed", "dollar:500", "kelly" or "kelly:0.5" (fractional), "kelly:0.5:0.02"
+    (capped at 2% of the balance), "anti:2:3" (step, max steps) and
+    "streak:3=0.5,5=0.25" (consecutive losses = risk multiplier).
+    """
+    kind, _, args = text.partition(":")
+    values = args.split(":") if args else []
+    try:
+        if kind == "fixed":
+            return FixedFraction()
+        if kind == "dollar":
+            return FixedDollar(float(values[0]))
+        if kind == "kelly":
+            return Kelly(*(float(value) for value in values))
+        if kind == "anti":
+            return AntiMartingale(*(f(value) for f, value in zip((float, int), values)))
+        if kind == "streak":
+            scales = {}
+            for item in args.split(","):
+                losses, scale = item.split("=")
+                scales[int(losses)] = float(scale)
+            return StreakScaling(scales)
+    except (IndexError, TypeError, ValueError):
+        raise SimulationInputError(f"Error: Invalid sizing {text!r}.") from None
+    raise SimulationInputError(f"Error: Unknown sizing {kind!r}, choose from fixed, dollar, kelly, anti, streak.")
@@ -0,0 +1,129 @@
+import logging
+import math
+from array import array
+
+from .probability_sim import PROGRESS_EVERY, SimulationInputError, SimulationParams
+from .rng_streams import as_streams
+
+
+class PathSampler:
+    # Keeps at most max_points evenly spaced points of a path (every point when
+    # max_points is None). When the buffer is full every other point is dropped
+    # and the stride doubles, so memory stays constant however long the run is
+    def __init__(self, max_points=None):
+        if max_points is not None and max_points < 2:
+            raise ValueError("max_points must be at least 2")
+        self.max_points = max_points
+        self.stride = 1
+        self.trades = array("q")
+        self.balances = array("d")
+
+    def add(self, trade, balance):
+        if trade % self.stride:
+            return
+        self.trades.append(trade)
+        self.balances.append(balance)
+        if self.max_points is not None and len(self.balances) > self.max_points:
+            self.stride *= 2
+            del self.trades[1::2]
+            del self.balances[1::2]
+
+    def finish(self, trade, balance):
+        # always end on the final balance
+        if not self.trades or self.trades[-1] != trade:
+            self.trades.append(trade)
+            self.balances.append(balance)
+
+
+def streaming_simulator(
+    initial_balance, winrate, risk_percent, rr_ratio, consecutive_L_treshold, num_trades, seed=None, keep_path=False, max_points=None, path=0
+):
+    """One-pass version of probability_simulator that never builds balance_history.
+
+    Peak, max drawdown, win/loss sums and the longest losing streak are updated
+    as the trades happen, so memory doesn't grow with num_trades. Returns
+    (stats, path): path is None unless keep_path is True, otherwise a
+    (trade_numbers, balances) pair, thinned to max_points points if given.
+    Same seed and path, same numbers as simulate_trading.
+    """
+    params = SimulationParams.from_inputs(initial_balance, winrate, risk_percent, rr_ratio, consecutive_L_treshold, num_trades)
+    initial_balance = params.initial_balance
+    winrate = params.winrate
+    rr_ratio = params.rr_ratio
+    num_trades = params.num_trades
+    # precomputed like the loop of simulate_trading, which this one mirrors bit for bit
+    risk = params.risk_percent / 100
+    half_risk = risk / 2
+    threshold = params.consecutive_L_treshold
+    if threshold is None:
+        threshold = num_trades + 1  # never reached, the risk reducer stays off
+    sampler = PathSampler(max_points) if keep_path else None
+
+    balance = initial_balance
+    peak_balance = initial_balance
+    max_drawdown = 0
+    consecutive_losses = 0
+    max_consecutive_losses = 0
+    wins_profits = 0
+    losses_profits = 0
+    wins = 0
+    reduced_risk_active = False
+    trade = 0
+
+    if sampler is not None:
+        sampler.add(0, balance)
+    # same draws as that row of simulate_paths, a block of PROGRESS_EVERY trades at a time
+    for draws in as_streams(seed).path_blocks(path, num_trades, PROGRESS_EVERY):
+        for draw in draws:
+            trade += 1
+            risk_amount = balance * (half_risk if reduced_risk_active else risk)
+            if draw <= winrate:
+                profit = risk_amount * rr_ratio
+                balance += profit
+                wins += 1
+                wins_profits += profit
+                consecutive_losses = 0
+                # new peak, drawdown is zero
+                if balance > peak_balance:
+                    peak_balance = balance
+            else:
+                balance -= risk_amount
+                losses_profits += risk_amount
+                consecutive_losses += 1
+                if consecutive_losses > max_consecutive_losses:
+                    max_consecutive_losses = consecutive_losses
+                drawdown = (peak_balance - balance) / peak_balance
+                if drawdown > max_drawdown:
+                    max_drawdown = drawdown
+            reduced_risk_active = consecutive_losses >= threshold
+            if sampler is not None:
+                sampler.add(trade, balance)
+
+    # Past about 1e308 the balance becomes inf and then nan, which would poison every
+    # stat (and the drawdown, inf / inf), so refuse such runs instead
+    if not math.isfinite(balance + wins_profits + losses_profits):
+        raise SimulationInputError(f"Error: The balance overflows within {num_trades} trades, simulate fewer trades.")
+
+    losses = num_trades - wins
+    actual_winrate = wins / num_trades
+    avg_win = wins_profits / wins if wins > 0 else 0
+    avg_loss = losses_profits / losses if losses > 0 else 0
+
+    stats = {
+        "final_balance": balance,
+        "total_return": ((balance - initial_balance) / initial_balance) * 100,
+        "max_drawdown": max_drawdown * 100,
+        "max_consecutive_losses": max_consecutive_losses,
+        "wins": wins,
+        "losses": losses,
+        "avg_win": avg_win,
+        "avg_loss": avg_loss,
+        "expected_value": (actual_winrate * avg_win) - ((1 - actual_winrate) * avg_loss),
+    }
+    logging.debug(f"Streaming simulation of {num_trades} trades done: {stats}")
+
+    path = None
+    if sampler is not None:
+        sampler.finish(num_trades, balance)
+        path = (sampler.trades, sampler.balances)
+    return stats, path
@@ -0,0 +1,264 @@
+import argparse
+import csv
+import itertools
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .probability_sim import SimulationInputError, SimulationParams
+from .result_cache import ResultCache
+from .rng_streams import as_streams
+from .vector_sim import simulate_paths
+
+PARAM_FIELDS = ("winrate", "risk_percent", "rr_ratio", "consecutive_L_treshold", "num_trades")
+SUMMARY_FIELDS = (
+    "mean_final_balance",
+    "median_final_balance",
+    "p5_final_balance",
+    "p95_final_balance",
+    "mean_return",
+    "prob_profit",
+    "mean_max_drawdown",
+    "median_max_drawdown",
+    "p95_max_drawdown",
+    "mean_max_consecutive_losses",
+    "worst_consecutive_losses",
+    "mean_expected_value",
+)
+
+# set in every worker process by _init_worker
+_worker = {}
+
+
+def parse_range(text):
+    # "0.4:0.6:0.05" -> 0.4, 0.45, ..., 0.6 (stop included), "1,2,3" -> 1, 2, 3, "2" -> 2
+    text = str(text).strip()
+    if ":" in text:
+        start, stop, step = (float(part) for part in text.split(":"))
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 10) for i in range(count)]
+    return [float(part) for part in text.split(",") if part.strip()]
+
+
+def build_grid(winrates, risk_percents, rr_ratios, thresholds, trade_counts):
+    # one row per cell, columns in PARAM_FIELDS order; threshold 0 means no risk reducer
+    return np.array(list(itertools.product(winrates, risk_percents, rr_ratios, thresholds, trade_counts)), dtype=float)
+
+
+def validate_grid(initial_balance, grid):
+    # Every cell checked before any work starts, so a bad one is reported up front
+    # instead of failing in a worker and losing the whole sweep
+    for winrate, risk_percent, rr_ratio, threshold, num_trades in grid:
+        try:
+            SimulationParams.from_inputs(initial_balance, winrate, risk_percent, rr_ratio, int(threshold), int(num_trades))
+        except SimulationInputError as error:
+            raise SimulationInputError(
+                f"{error} Invalid cell: winrate {winrate:g}, risk {risk_percent:g}, rr {rr_ratio:g}, "
+                f"threshold {threshold:g}, trades {num_trades:g}"
+            ) from None
+
+
+def summarize_stats(stats, initial_balance):
+    final_balance = stats["final_balance"]
+    max_drawdown = stats["max_drawdown"]
+    p5_final, median_final, p95_final = np.percentile(final_balance, [5, 50, 95])
+    median_drawdown, p95_drawdown = np.percentile(max_drawdown, [50, 95])
+    return {
+        "mean_final_balance": final_balance.mean(),
+        "median_final_balance": median_final,
+        "p5_final_balance": p5_final,
+        "p95_final_balance": p95_final,
+        "mean_return": stats["total_return"].mean(),
+        "prob_profit": np.mean(final_balance > initial_balance),
+        "mean_max_drawdown": max_drawdown.mean(),
+        "median_max_drawdown": median_drawdown,
+        "p95_max_drawdown": p95_drawdown,
+        "mean_max_consecutive_losses": stats["max_consecutive_losses"].mean(),
+        "worst_consecutive_losses": stats["max_consecutive_losses"].max(),
+        "mean_expected_value": stats["expected_value"].mean(),
+    }
+
+
+def paired_difference(stats_a, stats_b, stat="final_balance", antithetic=False):
+    """Mean of stat under configuration b minus a, and its standard error.
+
+    The two runs must have the same paths of the same seed (common random
+    numbers), so the difference is taken path by path and most of the noise
+    cancels. With antithetic runs every pair of paths is averaged first, as
+    the two halves of a pair aren't independent.
+    """
+    difference = np.asarray(stats_b[stat], dtype=np.float64) - np.asarray(stats_a[stat], dtype=np.float64)
+    if antithetic:
+        difference = difference[: len(difference) // 2 * 2].reshape(-1, 2).mean(axis=1)
+    return float(difference.mean()), float(difference.std(ddof=1) / np.sqrt(len(difference)))
+
+
+def _init_worker(shm_name, num_cells, grid, initial_balance, num_paths, streams, common_random_numbers):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm  # keep the mapping alive for the life of the worker
+    _worker["results"] = np.ndarray((num_cells, len(SUMMARY_FIELDS)), dtype=np.float64, buffer=shm.buf)
+    _worker["grid"] = grid
+    _worker["initial_balance"] = initial_balance
+    _worker["num_paths"] = num_paths
+    _worker["streams"] = streams
+    _worker["common_random_numbers"] = common_random_numbers
+
+
+def _run_cells(cells):
+    results = _worker["results"]
+    initial_balance = _worker["initial_balance"]
+    for cell in cells:
+        winrate, risk_percent, rr_ratio, threshold, num_trades = _worker["grid"][cell]
+        _, stats = simulate_paths(
+            initial_balance,
+            winrate,
+            risk_percent,
+            rr_ratio,
+            int(num_trades),
+            _worker["num_paths"],
+            consecutive_L_treshold=int(threshold),
+            # every cell has its own child stream, so the results don't depend
+            # on how the grid is split between workers; with common random numbers
+            # every cell sees the same draws instead
+            seed=_worker["streams"] if _worker["common_random_numbers"] else _worker["streams"].child(cell),
+            keep_paths=False,
+        )
+        summary = summarize_stats(stats, initial_balance)
+        results[cell] = [summary[name] for name in SUMMARY_FIELDS]
+    return len(cells)
+
+
+def _cell_key(cache, initial_balance, cell, num_paths, streams):
+    # the cache key of one grid cell, its summary row doesn't depend on the workers
+    winrate, risk_percent, rr_ratio, threshold, num_trades = (float(value) for value in cell)
+    return cache.make_key("sweep", initial_balance, winrate, risk_percent, rr_ratio, int(threshold), int(num_trades), streams, num_paths=int(num_paths))
+
+
+def run_sweep(
+    initial_balance,
+    winrates,
+    risk_percents,
+    rr_ratios,
+    thresholds,
+    trade_counts,
+    num_paths=1000,
+    seed=None,
+    workers=None,
+    chunk_size=None,
+    common_random_numbers=False,
+    antithetic=False,
+    cache=None,
+):
+    """Simulate every combination of the parameter lists on a process pool.
+
+    Each cell runs num_paths paths and its summary row (SUMMARY_FIELDS) is
+    written by the worker straight into a shared-memory array. Returns a dict
+    of columns: the PARAM_FIELDS of every cell followed by its summary stats.
+    With common_random_numbers every cell runs on the same draws (cells with
+    the same trade count see the same win/loss luck), so differences between
+    cells stand out from the noise with far fewer paths. antithetic pairs the
+    paths of every cell (see RandomStreams). A grid with an invalid cell raises
+    SimulationInputError before anything is simulated. With a seed and a
+    ResultCache (see result_cache), cells run before with the same inputs are
+    read from the cache and only the rest are simulated.
+    """
+    grid = build_grid(winrates, risk_percents, rr_ratios, thresholds, trade_counts)
+    validate_grid(initial_balance, grid)
+    num_cells = len(grid)
+    workers = workers or os.cpu_count() or 1
+    streams = as_streams(seed)
+    if antithetic:
+        streams = streams.with_antithetic()
+    logging.info(f"Sweeping {num_cells} cells x {num_paths} paths on {workers} workers (seed {streams.entropy})")
+
+    results = np.empty((num_cells, len(SUMMARY_FIELDS)))
+    # unseeded runs are random, so only seeded cells are looked up and stored
+    keys = [None] * num_cells
+    if cache is not None and seed is not None:
+        for cell in range(num_cells):
+            cell_streams = streams if common_random_numbers else streams.child(cell)
+            keys[cell] = _cell_key(cache, initial_balance, grid[cell], num_paths, cell_streams)
+    todo = []
+    for cell, key in enumerate(keys):
+        row = cache.get(key) if key is not None else None
+        if row is None:
+            todo.append(cell)
+        else:
+            results[cell] = row
+    if len(todo) < num_cells:
+        logging.info(f"{num_cells - len(todo)} cells read from the cache")
+    if todo:
+        chunk_size = chunk_size or max(1, len(todo) // (workers * 4))
+        shm = shared_memory.SharedMemory(create=True, size=num_cells * len(SUMMARY_FIELDS) * 8)
+        try:
+            initargs = (shm.name, num_cells, grid, float(initial_balance), int(num_paths), streams, common_random_numbers)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+                futures = [executor.submit(_run_cells, todo[start : start + chunk_size]) for start in range(0, len(todo), chunk_size)]
+                for future in futures:
+                    future.result()
+            results[todo] = np.ndarray((num_cells, len(SUMMARY_FIELDS)), dtype=np.float64, buffer=shm.buf)[todo]
+        finally:
+            shm.close()
+            shm.unlink()
+        for cell in todo:
+            if keys[cell] is not None:
+                cache.put(keys[cell], results[cell].copy())
+
+    table = {name: grid[:, i] for i, name in enumerate(PARAM_FIELDS)}
+    table.update({name: results[:, i] for i, name in enumerate(SUMMARY_FIELDS)})
+    return table
+
+
+def write_csv(table, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(table.keys())
+        writer.writerows(zip(*(column.tolist() for column in table.values())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep of the probability simulator")
+    parser.add_argument("--balance", type=float, default=50000)
+    parser.add_argument("--winrate", default="0.4:0.6:0.05", help="start:stop:step or comma separated values")
+    parser.add_argument("--risk", default="1", help="risk percent per trade")
+    parser.add_argument("--rr", default="2")
+    parser.add_argument("--threshold", default="0", help="consecutive losses before halving risk, 0 = off")
+    parser.add_argument("--trades", default="100")
+    parser.add_argument("--paths", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--crn", action="store_true", help="common random numbers: every cell runs on the same draws")
+    parser.add_argument("--antithetic", action="store_true", help="run the paths in antithetic pairs")
+    parser.add_argument("--out", default="sweep_results.csv")
+    parser.add_argument("--cache-dir", default=None, help="reuse the cells of earlier seeded runs stored here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    try:
+        table = run_sweep(
+            args.balance,
+            parse_range(args.winrate),
+            parse_range(args.risk),
+            parse_range(args.rr),
+            [int(t) for t in parse_range(args.threshold)],
+            [int(n) for n in parse_range(args.trades)],
+            num_paths=args.paths,
+            seed=args.seed,
+            workers=args.workers,
+            common_random_numbers=args.crn,
+            antithetic=args.antithetic,
+            cache=ResultCache(cache_dir=args.cache_dir) if args.cache_dir else None,
+        )
+    except ValueError as error:
+        logging.error(str(error))
+        return 1
+    write_csv(table, args.out)
+    logging.info(f"Saved {len(table['winrate'])} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import logging
+
+import numpy as np
+
+from .probability_sim import SimulationInputError, SimulationParams
+from .rng_streams import as_streams
+from .sizing import default_sizing
+
+# number of paths simulated together, keeps the per-chunk arrays small for big ensembles
+CHUNK_PATHS = 16384
+# trades drawn at a time when the paths aren't kept, so long horizons run in constant memory
+TRADE_BLOCK = 4096
+
+STAT_NAMES = (
+    "final_balance",
+    "total_return",
+    "max_drawdown",
+    "max_consecutive_losses",
+    "wins",
+    "losses",
+    "avg_win",
+    "avg_loss",
+    "expected_value",
+)
+
+
+def _loss_streaks(wins_by_trade, carry):
+    # Losing streak after every trade for every path: the distance to the last win,
+    # found with a running maximum over the win positions instead of a per-trade scan
+    trade_index = np.arange(1, wins_by_trade.shape[0] + 1, dtype=np.int32)[:, None]
+    streaks = np.where(wins_by_trade, trade_index, np.int32(0))
+    np.maximum.accumulate(streaks, axis=0, out=streaks)
+    np.subtract(trade_index, streaks, out=streaks)
+    # paths without a win yet in this block continue the streak they came in with
+    np.add(streaks, carry, out=streaks, where=streaks == trade_index)
+    return streaks
+
+
+class _PathState:
+    # Running state of a chunk of paths, carried from one block of trades to the next
+
+    def __init__(self, num_paths, initial_balance):
+        self.balance = np.full(num_paths, initial_balance)
+        self.peak_balance = self.balance.copy()
+        self.max_drawdown = np.zeros(num_paths)
+        self.wins_profits = np.zeros(num_paths)
+        self.losses_profits = np.zeros(num_paths)
+        self.wins = np.zeros(num_paths, dtype=np.int64)
+        self.consecutive_losses = np.zeros(num_paths, dtype=np.int32)
+        self.consecutive_wins = np.zeros(num_paths, dtype=np.int32)
+        self.max_consecutive_losses = np.zeros(num_paths, dtype=np.int32)
+        self.risk_level = np.zeros(num_paths, dtype=np.uint8)
+
+    def advance(self, wins_by_trade, sizing, risk, r_multiples, history=None, r_values=None):
+        # Step through a (trades, paths) block of outcomes with every path at once,
+        # doing the same float operations in the same order as the scalar loop.
+        # r_values: the R-multiple of every trade when it isn't one of two fixed ones
+        # (see bootstrap), r_multiples then only holds the sizing multipliers
+        num_trades, num_paths = wins_by_trade.shape
+        streaks = _loss_streaks(wins_by_trade, self.consecutive_losses)
+
+        # The sizing only depends on the outcomes: the risk level of a trade follows
+        # from the streaks after the previous one, so it is known before stepping. Each
+        # trade gets a code 2 * level + win that indexes r_multiples
+        codes = wins_by_trade.view(np.uint8).copy()
+        win_streaks = None
+        if sizing.needs_win_streaks:
+            win_streaks = _loss_streaks(~wins_by_trade, self.consecutive_wins)
+            self.consecutive_wins = win_streaks[-1].copy()
+        levels = sizing.next_levels(streaks, win_streaks)
+        if levels is not None:
+            codes[0] += np.uint8(2) * self.risk_level
+            codes[1:] += np.uint8(2) * levels[:-1]
+            self.risk_level = levels[-1].copy()
+
+        balance = self.balance
+        r_multiple = np.empty(num_paths)
+        change = np.empty(num_paths)
+        drawdown = np.empty(num_paths)
+        for trade in range(num_trades):
+            # a win pays risk * rr, a loss costs risk * -1 (the same as balance - risk)
+            np.take(r_multiples, codes[trade], out=r_multiple)
+            if r_values is not None:
+                r_multiple *= r_values[trade]
+            if sizing.proportional:
+                np.multiply(balance, risk, out=change)
+            else:
+                change.fill(risk)
+            change *= r_multiple
+            balance += change
+            self.wins_profits += np.maximum(change, 0.0)
+            self.losses_profits -= np.minimum(change, 0.0)
+
+            np.maximum(self.peak_balance, balance, out=self.peak_balance)
+            np.subtract(self.peak_balance, balance, out=drawdown)
+            drawdown /= self.peak_balance
+            np.maximum(self.max_drawdown, drawdown, out=self.max_drawdown)
+            if history is not None:
+                history[trade] = balance
+
+        self.wins += wins_by_trade.sum(axis=0)
+        self.consecutive_losses = streaks[-1].copy()
+        np.maximum(self.max_consecutive_losses, streaks.max(axis=0), out=self.max_consecutive_losses)
+
+    def stats(self, initial_balance, num_trades):
+        num_losses = num_trades - self.wins
+        actual_winrate = self.wins / num_trades
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_win = np.where(self.wins > 0, self.wins_profits / self.wins, 0.0)
+            avg_loss = np.where(num_losses > 0, self.losses_profits / num_losses, 0.0)
+
+        return {
+            "final_balance": self.balance,
+            "total_return": ((self.balance - initial_balance) / initial_balance) * 100,
+            "max_drawdown": self.max_drawdown * 100,
+            "max_consecutive_losses": self.max_consecutive_losses,
+            "wins": self.wins,
+            "losses": num_losses,
+            "avg_win": avg_win,
+            "avg_loss": avg_loss,
+            "expected_value": (actual_winrate * avg_win) - ((1 - actual_winrate) * avg_loss),
+        }
+
+
+def _r_multiples(sizing, params, resampled=False):
+    # the balance change per unit of base risk for code 2 * level + win: a scaled
+    # R-multiple. Halving it gives the same float result as halving the risk amount.
+    # resampled: the R-multiples come with the outcomes, only the multiplier is kept
+    multipliers = np.asarray(sizing.multipliers(params), dtype=np.float64)
+    if resampled:
+        return np.repeat(multipliers, 2)
+    return np.column_stack((-multipliers, multipliers * params.rr_ratio)).ravel()
+
+
+def _resolve_sizing(sizing, params):
+    if sizing is None:
+        return default_sizing(params)
+    if params.consecutive_L_treshold is not None:
+        raise SimulationInputError("Error: Use either the losses threshold or a sizing strategy (StreakScaling), not both.")
+    return sizing
+
+
+def _run_chunks(outcome_blocks, params, num_paths, balances, sizing=None, resampled=False):
+    # Steps every chunk of paths through its outcome blocks, writing the curves to
+    # balances (when given) and returning the per-path stats. With resampled, the
+    # blocks are (wins_by_trade, r_values) pairs instead of wins_by_trade alone
+    initial_balance = params.initial_balance
+    num_trades = params.num_trades
+    sizing = _resolve_sizing(sizing, params)
+    risk = sizing.base_risk(params)
+    r_multiples = _r_multiples(sizing, params, resampled)
+    keep_paths = balances is not None
+    block_trades = num_trades if keep_paths else TRADE_BLOCK
+    stats = {}
+    for start in range(0, num_paths, CHUNK_PATHS):
+        stop = min(start + CHUNK_PATHS, num_paths)
+        state = _PathState(stop - start, initial_balance)
+        history = np.empty((num_trades + 1, stop - start)) if keep_paths else None
+        if keep_paths:
+            history[0] = initial_balance
+
+        trade = 0
+        for block in outcome_blocks(start, stop, block_trades):
+            wins_by_trade, r_values = block if resampled else (block, None)
+            block_history = history[trade + 1 : trade + 1 + len(wins_by_trade)] if keep_paths else None
+            state.advance(wins_by_trade, sizing, risk, r_multiples, block_history, r_values)
+            trade += len(wins_by_trade)
+
+        for name, values in state.stats(initial_balance, num_trades).items():
+            stats.setdefault(name, np.empty(num_paths, dtype=values.dtype))[start:stop] = values
+        if keep_paths:
+            balances[start:stop] = history.T
+    return stats
+
+
+def _balances_out(out, keep_paths, num_paths, num_trades, dtype):
+    if out is not None:
+        if out.shape != (num_paths, num_trades + 1):
+            raise ValueError(f"out has shape {out.shape}, expected {(num_paths, num_trades + 1)}")
+        return out
+    return np.empty((num_paths, num_trades + 1), dtype=dtype) if keep_paths else None
+
+
+def simulate_paths(
+    initial_balance,
+    winrate,
+    risk_percent,
+    rr_ratio,
+    num_trades,
+    num_paths=1,
+    consecutive_L_treshold=None,
+    seed=None,
+    keep_paths=True,
+    path_start=0,
+    out=None,
+    dtype=np.float64,
+    antithetic=False,
+    sizing=None,
+):
+    """Simulate num_paths equity curves of num_trades trades each.
+
+    Returns (balances, stats): balances is a (num_paths, num_trades + 1) array
+    (None when keep_paths is False) and stats maps every name in STAT_NAMES to
+    a per-path array. consecutive_L_treshold turns on the risk reducer (half risk
+    after that many consecutive losses). seed is an int or a RandomStreams;
+    path_start picks which paths of that seed to run, so a big ensemble can be
+    split into pieces that match the single-call result exactly. Path 0 matches
+    probability_simulator called with the same seed. out is an optional
+    (num_paths, num_trades + 1) array, e.g. a memmap, the balances are written
+    into chunk by chunk instead of a new array (see path_store). dtype=np.float32
+    halves the size of the returned balances; the simulation and the stats are
+    still computed in float64. antithetic pairs the paths (see RandomStreams).
+    sizing is a PositionSizing strategy (see sizing); without one the risk is
+    risk_percent of the balance, halved by the reducer.
+    """
+    params = SimulationParams.from_inputs(initial_balance, winrate, risk_percent, rr_ratio, consecutive_L_treshold, num_trades)
+    num_paths = int(num_paths)
+    if num_paths <= 0:
+        raise SimulationInputError("Error: All inputs must be positive numbers.")
+    winrate = params.winrate
+    num_trades = params.num_trades
+
+    logging.debug(f"Simulating {num_paths} paths of {num_trades} trades")
+    streams = as_streams(seed)
+    if antithetic:
+        streams = streams.with_antithetic()
+    balances = _balances_out(out, keep_paths, num_paths, num_trades, dtype)
+
+    def outcome_blocks(start, stop, block_trades):
+        for uniforms in streams.uniform_blocks(path_start + start, path_start + stop, num_trades, block_trades):
+            yield np.ascontiguousarray((uniforms <= winrate).T)
+
+    stats = _run_chunks(outcome_blocks, params, num_paths, balances, sizing)
+    return balances, stats
+
+
+def replay_outcomes(
+    outcomes, initial_balance, risk_percent, rr_ratio, consecutive_L_treshold=None, keep_paths=True, out=None, dtype=np.float64, sizing=None
+):
+    """Rebuild the equity curves of recorded trade outcomes.
+
+    outcomes is a (num_paths, num_trades) bool array, True for a win. Returns
+    (balances, stats) like simulate_paths; given the outcomes simulate_paths
+    drew, the result is bit-identical, so a run can be stored as one bit per
+    trade and its balances rebuilt on demand (see path_store.PackedOutcomes).
+    """
+    outcomes = np.asarray(outcomes, dtype=bool)
+    if outcomes.ndim != 2:
+        raise ValueError("outcomes must be a (num_paths, num_trades) array")
+    num_paths, num_trades = outcomes.shape
+    # the winrate plays no part once the outcomes are known
+    params = SimulationParams.from_inputs(initial_balance, 1, risk_percent, rr_ratio, consecutive_L_treshold, num_trades)
+    if num_paths <= 0:
+        raise SimulationInputError("Error: All inputs must be positive numbers.")
+    balances = _balances_out(out, keep_paths, num_paths, num_trades, dtype)
+
+    def outcome_blocks(start, stop, block_trades):
+        for trade_start in range(0, num_trades, block_trades):
+            yield np.ascontiguousarray(outcomes[start:stop, trade_start : trade_start + block_trades].T)
+
+    stats = _run_chunks(outcome_blocks, params, num_paths, balances, sizing)
+    return balances, stats
+
+
+def iter_paths(
+    initial_balance,
+    winrate,
+    risk_percent,
+    rr_ratio,
+    num_trades,
+    num_paths,
+    consecutive_L_treshold=None,
+    seed=None,
+    chunk_paths=CHUNK_PATHS,
+    antithetic=False,
+    sizing=None,
+):
+    """simulate_paths in slices of chunk_paths paths, yielded as soon as each is done.
+
+    Yields (path_start, balances, stats) for paths path_start..path_start +
+    len(balances), so a consumer (a live plot, a writer) can work on the first
+    paths while the rest are simulated. The slices put together are exactly
+    simulate_paths with the same seed.
+    """
+    num_paths = int(num_paths)
+    streams = as_streams(seed)
+    for start in range(0, num_paths, chunk_paths):
+        stop = min(start + chunk_paths, num_paths)
+        balances, stats = simulate_paths(
+            initial_balance,
+            winrate,
+            risk_percent,
+            rr_ratio,
+            num_trades,
+            stop - start,
+            consecutive_L_treshold,
+            streams,
+            path_start=start,
+            antithetic=antithetic,
+            sizing=sizing,
+        )
+        yield start, balances, stats
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from resources.custom_func.probability_sim import SimulationParams, simulate_trading
+from resources.custom_func.vector_sim import STAT_NAMES, simulate_paths
+
+SEED = 7
+
+
+class ScalarVectorEquivalence(unittest.TestCase):
+    # The vector engine must match the scalar reference exactly, path for path: the
+    # streaming stats, replay, packed outcomes and bootstrap engines all build on it
+
+    def assert_paths_match(self, threshold, num_paths):
+        params = SimulationParams.from_inputs(50000, 0.45, 1, 2, threshold, 500)
+        balances, stats = simulate_paths(
+            params.initial_balance,
+            params.winrate,
+            params.risk_percent,
+            params.rr_ratio,
+            params.num_trades,
+            num_paths,
+            params.threshold_input,
+            SEED,
+        )
+        for path in range(num_paths):
+            result = simulate_trading(params, seed=SEED, path=path)
+            np.testing.assert_array_equal(balances[path], np.asarray(result.balance_history))
+            for name in STAT_NAMES:
+                self.assertEqual(stats[name][path], getattr(result, name), f"{name} of path {path}")
+
+    def test_single_path(self):
+        self.assert_paths_match(None, 1)
+
+    def test_single_path_with_reducer(self):
+        self.assert_paths_match(3, 1)
+
+    def test_many_paths(self):
+        self.assert_paths_match(None, 20)
+
+    def test_many_paths_with_reducer(self):
+        self.assert_paths_match(3, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
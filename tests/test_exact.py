@@ -0,0 +1,38 @@
+import unittest
+
+from resources.custom_func.exact_dist import check_against_monte_carlo, exact_distribution
+from resources.custom_func.probability_sim import SimulationInputError, SimulationParams
+
+SEED = 7
+NUM_PATHS = 20000
+
+
+class ReducerDistributionAgainstMonteCarlo(unittest.TestCase):
+    # The reducer DP must agree with the sampled final balances wherever its grid ends
+    # up, including when the starting balance is far from the bulk of the outcome
+
+    def assert_matches(self, winrate, num_trades, tolerance):
+        params = SimulationParams.from_inputs(50000, winrate, 1, 2, 3, num_trades)
+        for name, (exact, sampled) in check_against_monte_carlo(params, NUM_PATHS, SEED).items():
+            if name == "prob_profit":
+                self.assertAlmostEqual(exact, sampled, delta=0.01, msg=name)
+            else:
+                self.assertAlmostEqual(exact / sampled, 1, delta=tolerance, msg=f"{name}: {exact} vs {sampled}")
+
+    def test_strong_edge_long_horizon(self):
+        self.assert_matches(0.55, 4000, 0.05)
+
+    def test_winrate_near_one(self):
+        self.assert_matches(0.99, 1000, 0.03)
+
+    def test_winrate_near_zero(self):
+        self.assert_matches(0.01, 300, 0.01)
+
+    def test_too_coarse_grid_raises(self):
+        params = SimulationParams.from_inputs(50000, 0.01, 1, 2, 3, 1000)
+        with self.assertRaises(SimulationInputError):
+            exact_distribution(params, buckets=500)
+
+
+if __name__ == "__main__":
+    unittest.main()
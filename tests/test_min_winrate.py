@@ -0,0 +1,28 @@
+import unittest
+
+from resources.custom_func.min_winrate import min_winrate_calculator
+
+SEED = 7
+
+
+class ExactAgainstMonteCarlo(unittest.TestCase):
+    # Both methods must solve to the same winrate, also over a horizon long enough for
+    # the reducer DP's outcome to drift far from the starting balance
+
+    def assert_methods_agree(self, goal, num_trades):
+        solutions = {
+            method: min_winrate_calculator(goal, [2], [3], num_trades=num_trades, method=method, num_paths=10000, seed=SEED, tolerance=1e-3)[0]
+            for method in ("exact", "monte_carlo")
+        }
+        self.assertTrue(solutions["exact"].solved)
+        self.assertAlmostEqual(solutions["exact"].value, solutions["monte_carlo"].value, delta=0.01)
+
+    def test_total_return_long_horizon(self):
+        self.assert_methods_agree("P(total_return>98000000)>=0.5", 1000)
+
+    def test_final_balance_long_horizon(self):
+        self.assert_methods_agree("P(final_balance<5000000000)<=0.05", 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
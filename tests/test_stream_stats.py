@@ -0,0 +1,28 @@
+import unittest
+
+from resources.custom_func.probability_sim import SimulationInputError, SimulationParams, simulate_trading
+from resources.custom_func.stream_stats import streaming_simulator
+
+SEED = 7
+
+
+class StreamingAgainstScalar(unittest.TestCase):
+    # The one-pass engine must give the scalar engine's stats exactly, and refuse runs
+    # whose balance no longer fits a float
+
+    def test_stats_match(self):
+        for threshold in (None, "3"):
+            params = SimulationParams.from_inputs(50000, 0.45, 1, 2, threshold, 5000)
+            for path in range(5):
+                stats, _ = streaming_simulator(50000, 0.45, 1, 2, threshold, 5000, seed=SEED, path=path)
+                result = simulate_trading(params, seed=SEED, path=path)
+                for name, value in stats.items():
+                    self.assertEqual(value, getattr(result, name), f"{name} of path {path}")
+
+    def test_overflow_raises(self):
+        with self.assertRaises(SimulationInputError):
+            streaming_simulator(50000, 0.55, 1, 2, "3", 200000, seed=SEED)
+
+
+if __name__ == "__main__":
+    unittest.main()